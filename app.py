@@ -1,21 +1,166 @@
+import fcntl
+import hashlib
+import logging
+import os
+
+import orjson
 from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+from flask_compress import Compress
+from jinja2 import FileSystemBytecodeCache
+from sqlalchemy import event, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import configure_mappers
+from sqlalchemy.pool import QueuePool, StaticPool
 from config import db
 
-def create_app():
-    app = Flask(__name__)
+
+def engine_options(database_uri):
+    """Connection pool settings for the app database engine."""
+    if database_uri.startswith('sqlite'):
+        connect_args = {'check_same_thread': False}
+        if database_uri in ('sqlite://', 'sqlite:///:memory:'):
+            # In-memory databases only exist on a single connection
+            return {'poolclass': StaticPool, 'connect_args': connect_args}
+    else:
+        connect_args = {}
+    
+    return {
+        'poolclass': QueuePool,
+        'pool_size': 10,
+        'max_overflow': 20,
+        'pool_pre_ping': True,
+        'pool_recycle': 1800,
+        'connect_args': connect_args
+    }
+
+
+class ORJSONProvider(DefaultJSONProvider):
+    """JSON provider that encodes with orjson instead of the stdlib json module."""
+    
+    def _dumpb(self, obj, **kwargs):
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_SERIALIZE_NUMPY
+        if kwargs.get('sort_keys', self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        if kwargs.get('indent'):
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=kwargs.get('default', self.default), option=option)
+    
+    def dumps(self, obj, **kwargs):
+        return self._dumpb(obj, **kwargs).decode()
+    
+    def response(self, *args, **kwargs):
+        """Like the default provider's response(), but the body is orjson's bytes as-is."""
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        return self._app.response_class(self._dumpb(obj, indent=indent) + b'\n', mimetype=self.mimetype)
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Enable WAL journaling and relax fsync/cache settings on each new SQLite connection."""
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.execute('PRAGMA temp_store=MEMORY')
+    cursor.execute('PRAGMA cache_size=-64000')
+    cursor.execute('PRAGMA mmap_size=268435456')
+    cursor.close()
+
+
+def _schema_fingerprint(metadata):
+    """Stable hash of the declared tables and their column signatures."""
+    signature = [
+        (table.name, [(column.name, str(column.type), column.nullable, column.primary_key)
+                      for column in table.columns])
+        for table in sorted(metadata.tables.values(), key=lambda table: table.name)
+    ]
+    return hashlib.sha256(repr(signature).encode('utf-8')).hexdigest()
+
+
+def _stored_schema_fingerprint():
+    """Fingerprint recorded by the last create_all(), or None if there is none."""
+    try:
+        with db.engine.connect() as conn:
+            return conn.execute(text('SELECT fingerprint FROM _schema_meta')).scalar()
+    except DBAPIError:
+        return None
+
+
+def ensure_schema(app):
+    """Run db.create_all() only when the models changed since the last recorded run."""
+    fingerprint = _schema_fingerprint(db.metadata)
+    if _stored_schema_fingerprint() == fingerprint:
+        return
+    
+    # Only one worker performs the DDL; the others wait and then see the new fingerprint
+    os.makedirs(app.instance_path, exist_ok=True)
+    with open(os.path.join(app.instance_path, 'schema.lock'), 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            if _stored_schema_fingerprint() == fingerprint:
+                return
+            db.create_all()
+            with db.engine.begin() as conn:
+                conn.execute(text('CREATE TABLE IF NOT EXISTS _schema_meta (fingerprint TEXT NOT NULL)'))
+                conn.execute(text('DELETE FROM _schema_meta'))
+                conn.execute(text('INSERT INTO _schema_meta (fingerprint) VALUES (:fingerprint)'),
+                             {'fingerprint': fingerprint})
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def create_app(test_config=None):
+    """Build the app; test_config overrides settings, and its instance_path relocates the
+    instance folder (database, PDF previews)."""
+    test_config = dict(test_config or {})
+    app = Flask(__name__, instance_path=test_config.pop('instance_path', None))
+    app.json = ORJSONProvider(app)
     app.secret_key = 'change-me'
     app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///jasper_reports.db'
+    app.config.from_mapping(test_config)
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-    app.config['DEBUG'] = True  # Enable debug mode
+    # Debug mode (reloader, interactive debugger) only in development
+    app.config['DEBUG'] = os.environ.get('FLASK_ENV') == 'development'
+    if app.debug:
+        # Per-request trace logging from the editor is only wanted while developing
+        logging.getLogger('jasper_report_editor').setLevel(logging.DEBUG)
+    
+    # Compress report HTML and JSON payloads on the wire
+    app.config['COMPRESS_MIMETYPES'] = [
+        'text/html', 'application/json', 'application/xml', 'text/css', 'application/javascript'
+    ]
+    app.config['COMPRESS_LEVEL'] = 5
+    app.config['COMPRESS_ALGORITHM'] = ['br', 'gzip']
+    Compress(app)
+    
+    # Share compiled templates across workers and restarts. Jinja's default directory is private
+    # to this user (0700, owner checked), as the cached bytecode is loaded with marshal.
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache()
+    if not app.debug:
+        app.jinja_env.auto_reload = False
     
     db.init_app(app)
     
     # Import blueprint
-    from jasper_report_editor import jasper_report_editor_bp
+    from jasper_report_editor import jasper_report_editor_bp, init_app as init_jasper_report_editor
     app.register_blueprint(jasper_report_editor_bp, url_prefix='/editor')
+    init_jasper_report_editor(app)
     
     with app.app_context():
-        db.create_all()
+        if db.engine.dialect.name == 'sqlite':
+            event.listen(db.engine, 'connect', _set_sqlite_pragmas)
+        ensure_schema(app)
+        
+        # Compile every template at boot so first requests don't pay for it
+        for template_name in app.jinja_env.list_templates():
+            app.jinja_env.get_template(template_name)
+        
+        # Likewise configure the ORM mappers (models are registered by the blueprint import)
+        configure_mappers()
     
     # Add a simple route to test
     @app.route('/')
@@ -24,18 +169,17 @@ def create_app():
     
     return app
 
-app = create_app()
-
 
 if __name__ == '__main__':
+    # Development server only; use `gunicorn -c gunicorn.conf.py wsgi:application` in production.
+    # The app is built here rather than at import so it is constructed exactly once; the
+    # reloader would re-import this module and build it again, so use
+    # `flask --app app run --debug` when auto-reload is wanted.
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s %(message)s')
+    logger = logging.getLogger('jasper.boot')
     try:
-        print("Starting Flask app...")
-        print("App will be available at:")
-        print("  - Local: http://127.0.0.1:8081/")
-        print("  - Editor: http://127.0.0.1:8081/editor/")
-        print("  - Network: http://0.0.0.0:8081/")
-        app.run(host='0.0.0.0', port=8081, debug=True)
-    except Exception as e:
-        print(f"Error starting app: {e}")
-        import traceback
-        traceback.print_exc()
+        app = create_app()
+        logger.info('Starting Flask app on http://0.0.0.0:8081/ (editor at /editor/)')
+        app.run(host='0.0.0.0', port=8081, debug=app.debug, use_reloader=False)
+    except Exception:
+        logger.exception('Error starting app')
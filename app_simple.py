@@ -4,13 +4,17 @@ Simplified version of the main app to test step by step.
 """
 
 from flask import Flask, render_template, redirect, url_for
+from flask_caching import Cache
 import os
 
 app = Flask(__name__)
 app.secret_key = 'change-me'
 app.config['DEBUG'] = True
 
+cache = Cache(app, config={'CACHE_TYPE': 'SimpleCache'})
+
 @app.route('/')
+@cache.cached(timeout=3600)
 def index():
     return '<h1>Jasper Reports App</h1><p><a href="/editor/">Go to Editor</a></p>'
 
@@ -22,18 +26,10 @@ def editor_index():
 def test_route(report_id):
     return f'<h1>Test Route</h1><p>Report ID: {report_id}</p>'
 
-@app.route('/editor/simple_sample/<report_id>')
-def simple_sample(report_id):
-    """Simple sample report route without complex dependencies."""
-    valid_reports = ['customer_orders', 'customer_summary', 'orders_by_date']
-    
-    if report_id not in valid_reports:
-        return f'<h1>Invalid Report</h1><p>Report ID: {report_id} not in {valid_reports}</p>'
-    
-    # Simple JRXML content
-    jrxml_content = f'''<?xml version="1.0" encoding="UTF-8"?>
+# Simple JRXML content
+JRXML_SRC = '''<?xml version="1.0" encoding="UTF-8"?>
 <jasperReport xmlns="http://jasperreports.sourceforge.net/jasperreports"
-              name="{report_id}_Report" pageWidth="595" pageHeight="842">
+              name="{{ report_id }}_Report" pageWidth="595" pageHeight="842">
     <title>
         <band height="60">
             <staticText>
@@ -41,24 +37,54 @@ def simple_sample(report_id):
                 <textElement textAlignment="Center">
                     <font size="18" isBold="true"/>
                 </textElement>
-                <text><![CDATA[{report_id.replace('_', ' ').title()} Report]]></text>
+                <text><![CDATA[{{ title }} Report]]></text>
             </staticText>
         </band>
     </title>
 </jasperReport>'''
-    
-    return f'''
+
+PAGE_SRC = '''
     <html>
-    <head><title>Sample: {report_id}</title></head>
+    <head><title>Sample: {{ report_id }}</title></head>
     <body>
-        <h1>Sample Report: {report_id}</h1>
+        <h1>Sample Report: {{ report_id }}</h1>
         <p><a href="/editor/">Back to Editor</a></p>
         <h3>JRXML Content:</h3>
-        <pre style="background: #f5f5f5; padding: 10px;">{jrxml_content}</pre>
+        <pre style="background: #f5f5f5; padding: 10px;">{{ jrxml|safe }}</pre>
     </body>
     </html>
     '''
 
+# Compiled once; rendering only runs the generated template code
+_JRXML_TMPL = app.jinja_env.from_string(JRXML_SRC)
+_PAGE_TMPL = app.jinja_env.from_string(PAGE_SRC)
+
+TITLE_BY_ID = {
+    report_id: report_id.replace('_', ' ').title()
+    for report_id in ('customer_orders', 'customer_summary', 'orders_by_date')
+}
+_VALID_REPORTS = frozenset(TITLE_BY_ID)
+_VALID_REPORTS_TEXT = str(list(TITLE_BY_ID))
+
+def _render_sample(report_id):
+    """Build the sample page for one report."""
+    title = TITLE_BY_ID[report_id]
+    return _PAGE_TMPL.render(
+        report_id=report_id,
+        jrxml=_JRXML_TMPL.render(report_id=report_id, title=title)
+    )
+
+# The sample set is fixed, so each page is rendered once at import
+HTML_BY_ID = {report_id: _render_sample(report_id) for report_id in TITLE_BY_ID}
+
+@app.route('/editor/simple_sample/<report_id>')
+def simple_sample(report_id):
+    """Simple sample report route without complex dependencies."""
+    if report_id not in _VALID_REPORTS:
+        return f'<h1>Invalid Report</h1><p>Report ID: {report_id} not in {_VALID_REPORTS_TEXT}</p>'
+    
+    return HTML_BY_ID[report_id]
+
 if __name__ == '__main__':
     print("Starting simplified Flask app...")
     print("URLs:")
@@ -1,3 +1,5 @@
 from flask_sqlalchemy import SQLAlchemy
 
-db = SQLAlchemy()
\ No newline at end of file
+# Queries never need pending changes flushed first, and objects are not
+# reloaded after commit; the app only ever reads them back as plain values.
+db = SQLAlchemy(session_options={'autoflush': False, 'expire_on_commit': False})
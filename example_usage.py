@@ -11,52 +11,50 @@ This script demonstrates the main features of the PyJasper library:
 """
 
 import os
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from pyjasper_lib import JasperReport, ReportBuilder
-from pyjasper_lib.database import DatabaseEngine
-from pyjasper_lib.charts import ChartRenderer, FormattingUtils
-from pyjasper_lib.subreports import TemplateManager, ReportComposer
 
 
 def example_1_basic_report():
     """Example 1: Basic report generation from JRXML file."""
     print("=== Example 1: Basic Report Generation ===")
     
+    from pyjasper_lib import JasperReport
+    
     # Use the existing sample JRXML file
     jrxml_path = "uploads/sample_employee_report.jrxml"
     
-    if os.path.exists(jrxml_path):
-        # Create report from file
-        report = JasperReport(jrxml_path=jrxml_path)
-        
-        # Set up database connection
-        report.set_database_connection("sqlite:///sample.db")
-        
-        # Generate HTML report
-        html_content = report.generate_html()
-        
-        # Save the report
-        with open("output/employee_report.html", "wb") as f:
-            f.write(html_content)
-        
-        print("HTML report generated: output/employee_report.html")
-        
-        # Generate PDF report
-        try:
-            pdf_content = report.generate_pdf()
-            with open("output/employee_report.pdf", "wb") as f:
-                f.write(pdf_content)
-            print("PDF report generated: output/employee_report.pdf")
-        except Exception as e:
-            print(f"PDF generation failed: {e}")
-    else:
+    try:
+        jrxml = Path(jrxml_path).read_bytes()
+    except FileNotFoundError:
         print(f"JRXML file not found: {jrxml_path}")
+        return
+    
+    # Create report from the file contents
+    report = JasperReport(jrxml_bytes=jrxml)
+    
+    # Set up database connection
+    report.set_database_connection("sqlite:///sample.db")
+    
+    # Generate HTML report straight into the output file
+    report.save_report("output/employee_report.html")
+    
+    print("HTML report generated: output/employee_report.html")
+    
+    # Generate PDF report
+    try:
+        report.save_report("output/employee_report.pdf", "pdf")
+        print("PDF report generated: output/employee_report.pdf")
+    except Exception as e:
+        print(f"PDF generation failed: {e}")
 
 
 def example_2_programmatic_report():
     """Example 2: Building reports programmatically."""
     print("\n=== Example 2: Programmatic Report Building ===")
     
+    from pyjasper_lib import ReportBuilder
+    
     # Create a report builder
     builder = ReportBuilder("Sales Report")
     builder.set_title("Monthly Sales Report")
@@ -84,10 +82,7 @@ def example_2_programmatic_report():
     report.set_data(sample_data)
     
     # Generate and save HTML report
-    html_content = report.generate_html()
-    os.makedirs("output", exist_ok=True)
-    with open("output/sales_report.html", "wb") as f:
-        f.write(html_content)
+    report.save_report("output/sales_report.html")
     
     print("Programmatic report generated: output/sales_report.html")
 
@@ -107,14 +102,14 @@ def example_3_data_processing():
     
     # Process data
     from pyjasper_lib.database import DataProcessor
+    from pyjasper_lib.charts import FormattingUtils
     processor = DataProcessor(sales_data)
     
-    # Group by region
-    regions = processor.group_by("region")
+    # Aggregate by region
+    regions = processor.aggregate("region", "amount")
     print("Sales by Region:")
-    for region, sales in regions.items():
-        total = processor.calculate_sum("amount", sales)
-        print(f"  {region}: {FormattingUtils.format_currency(total)}")
+    for region, stats in regions.items():
+        print(f"  {region}: {FormattingUtils.format_currency(stats['sum'])}")
     
     # Calculate overall totals
     total_sales = processor.calculate_sum("amount")
@@ -128,6 +123,8 @@ def example_4_chart_generation():
     """Example 4: Chart generation."""
     print("\n=== Example 4: Chart Generation ===")
     
+    from pyjasper_lib.charts import ChartRenderer
+    
     try:
         chart_renderer = ChartRenderer()
         
@@ -165,7 +162,6 @@ def example_4_chart_generation():
         </html>
         """
         
-        os.makedirs("output", exist_ok=True)
         with open("output/sales_chart.html", "w") as f:
             f.write(html_content)
         
@@ -179,6 +175,8 @@ def example_5_templates():
     """Example 5: Using templates."""
     print("\n=== Example 5: Template Usage ===")
     
+    from pyjasper_lib.subreports import TemplateManager
+    
     try:
         # Create template manager
         template_manager = TemplateManager("templates")
@@ -236,10 +234,7 @@ def example_5_templates():
         report.set_data(customer_data)
         
         # Generate report
-        html_content = report.generate_html()
-        os.makedirs("output", exist_ok=True)
-        with open("output/customer_report.html", "wb") as f:
-            f.write(html_content)
+        report.save_report("output/customer_report.html")
         
         print("Template-based report generated: output/customer_report.html")
         print(f"Available templates: {template_manager.list_templates()}")
@@ -252,6 +247,8 @@ def example_6_validation():
     """Example 6: Report validation."""
     print("\n=== Example 6: Report Validation ===")
     
+    from pyjasper_lib import JasperReport
+    
     # Valid JRXML
     valid_jrxml = '''<?xml version="1.0" encoding="UTF-8"?>
 <jasperReport xmlns="http://jasperreports.sourceforge.net/jasperreports" name="ValidReport">
@@ -301,21 +298,30 @@ def example_6_validation():
         print(f"  Validation failed: {e}")
 
 
+def _run(example):
+    """Run a single example in a worker process."""
+    example()
+
+
 def main():
     """Run all examples."""
     print("PyJasper Library Examples")
     print("=" * 50)
     
-    # Create output directory
-    os.makedirs("output", exist_ok=True)
+    # Create output directory once; every example writes into it
+    Path("output").mkdir(parents=True, exist_ok=True)
     
-    # Run examples
-    example_1_basic_report()
-    example_2_programmatic_report()
-    example_3_data_processing()
-    example_4_chart_generation()
-    example_5_templates()
-    example_6_validation()
+    # Run examples; they write to separate files and share no state
+    examples = [
+        example_1_basic_report,
+        example_2_programmatic_report,
+        example_3_data_processing,
+        example_4_chart_generation,
+        example_5_templates,
+        example_6_validation,
+    ]
+    with ProcessPoolExecutor(max_workers=min(len(examples), os.cpu_count() or 1)) as executor:
+        list(executor.map(_run, examples))
     
     print("\n" + "=" * 50)
     print("All examples completed!")
@@ -0,0 +1,13 @@
+"""
+Gunicorn configuration for the Jasper Reports app.
+"""
+
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8081')
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+# gevent workers keep blocking SQLite / report generation I/O from pinning a worker
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gevent')
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+accesslog = '-'
@@ -1,3 +1,5 @@
+import os
+
 from flask import Blueprint
 
 jasper_report_editor_bp = Blueprint(
@@ -8,3 +10,16 @@ jasper_report_editor_bp = Blueprint(
 )
 
 from . import routes  # noqa: E402,F401
+
+
+def init_app(app):
+    """Give the app its own JasperManager and PDF preview directory; the editor routes reach
+    them through current_app."""
+    from .fsutil import private_directory
+    from .manager import JasperManager
+    app.extensions['jasper_manager'] = JasperManager()
+    
+    os.makedirs(app.instance_path, exist_ok=True)
+    app.extensions['jasper_pdf_previews'] = private_directory(
+        os.path.join(app.instance_path, 'pdf_previews')
+    )
@@ -0,0 +1,21 @@
+"""
+Filesystem helpers shared by the editor routes and the JasperReports engine.
+"""
+
+import os
+import stat
+from pathlib import Path
+
+
+def private_directory(path):
+    """Create path as a directory only this user can access, or check that an existing one is."""
+    try:
+        os.mkdir(path, 0o700)
+    except FileExistsError:
+        pass
+    
+    # lstat, so a symlink planted in its place is refused rather than followed
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o077:
+        raise RuntimeError(f'{path} must be a directory owned by the current user and closed to others')
+    return Path(path)
@@ -1,28 +1,227 @@
 import os
 import tempfile
 import subprocess
-import json
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import closing
+from functools import lru_cache
 from pathlib import Path
-import base64
 from io import BytesIO
+from operator import itemgetter
 import logging
 
+from lxml import etree
+
+from pyjasper_lib.cache import LRUCache
+from pyjasper_lib.parsers import _XML_DECLARATION_RE, _parse_xml
+
+from .fsutil import private_directory
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Number of distinct JRXML documents whose parsed metadata is kept per engine
+JRXML_CACHE_SIZE = 64
+
+# Number of compiled .jasper reports kept loaded in the JVM per engine
+COMPILED_CACHE_SIZE = 32
+
+# Temp file janitor: seconds between sweeps, and age after which leftovers are removed
+JANITOR_INTERVAL = 30
+TEMP_FILE_TTL = 300
+
+_pending_unlinks = deque()
+_janitor_started = False
+_janitor_lock = threading.Lock()
+
+
+def _unlink_quietly(file_path):
+    """Delete a file, logging instead of raising on failure."""
+    try:
+        file_path.unlink(missing_ok=True)
+    except Exception as e:
+        logger.warning(f"Could not delete temp file {file_path}: {e}")
+
+
+def _janitor(temp_dir):
+    """Delete queued temp files and sweep stale ones from temp_dir, forever."""
+    while True:
+        time.sleep(JANITOR_INTERVAL)
+        while _pending_unlinks:
+            _unlink_quietly(_pending_unlinks.popleft())
+        
+        cutoff = time.time() - TEMP_FILE_TTL
+        try:
+            with os.scandir(temp_dir) as entries:
+                for entry in entries:
+                    if entry.is_file() and entry.stat().st_mtime < cutoff:
+                        _unlink_quietly(Path(entry.path))
+        except OSError as e:
+            logger.warning(f"Temp directory sweep failed: {e}")
+
+
+def _start_janitor(temp_dir):
+    """Start the janitor thread once per process."""
+    global _janitor_started
+    with _janitor_lock:
+        if not _janitor_started:
+            threading.Thread(target=_janitor, args=(temp_dir,), name='jasper-temp-janitor', daemon=True).start()
+            _janitor_started = True
+
+
+# Escapes text for HTML element content; str.translate does it in one C-level pass
+_HTML_ESCAPE = str.maketrans({'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;'})
+
+# Number of rows generated when a report has no data source
+SAMPLE_ROW_COUNT = 5
+
+# Rows fetched per round-trip when streaming a report query
+DB_FETCH_BATCH_SIZE = 10000
+
+# Sample column builders, matched in order against the lowercased field name.
+# Each returns the whole column for rows 1..n at once.
+_SAMPLE_DEPARTMENTS = ['IT', 'Sales', 'HR', 'Finance', 'Marketing']
+_SAMPLE_COLUMNS = (
+    (('id',), lambda n, name: list(range(1, n + 1))),
+    (('name',), lambda n, name: [f'Sample Name {k}' for k in range(1, n + 1)]),
+    (('email',), lambda n, name: [f'user{k}@example.com' for k in range(1, n + 1)]),
+    (('date',), lambda n, name: [f'2024-0{(i % 12) + 1}-{(i % 28) + 1:02d}' for i in range(n)]),
+    (('amount', 'salary'), lambda n, name: list(range(1500, n * 1000 + 1500, 1000))),
+    (('department',), lambda n, name: [_SAMPLE_DEPARTMENTS[i % len(_SAMPLE_DEPARTMENTS)] for i in range(n)]),
+)
+
+
+def _generic_sample_column(n, name):
+    return [f'Sample {name} {k}' for k in range(1, n + 1)]
+
+
+def _sample_column_builder(field_name):
+    """Pick the sample column builder for a field from its name."""
+    lowered = field_name.lower()
+    for keywords, build in _SAMPLE_COLUMNS:
+        if any(keyword in lowered for keyword in keywords):
+            return build
+    return _generic_sample_column
+
+
+def _field_row_getter(field_names, column_names):
+    """Return a function mapping a result tuple to its values for field_names, '' where a column is missing."""
+    positions = {name: i for i, name in enumerate(column_names)}
+    indexes = [positions.get(field_name) for field_name in field_names]
+    if None not in indexes and len(indexes) > 1:
+        return itemgetter(*indexes)
+    return lambda row: tuple('' if i is None else row[i] for i in indexes)
+
+
+@lru_cache(maxsize=JRXML_CACHE_SIZE)
+def _header_labels(field_names):
+    """Column headers for a report's fields, e.g. 'order_id' -> 'Order Id'; computed once per field set."""
+    return tuple(field_name.replace('_', ' ').title() for field_name in field_names)
+
+
+def _is_currency_field(field_name):
+    """Whether a field's values are rendered as currency."""
+    lowered = field_name.lower()
+    return 'amount' in lowered or 'salary' in lowered
+
+
+@lru_cache(maxsize=None)
+def _load_reportlab():
+    """Import the reportlab pieces the PDF fallback needs, once per process."""
+    from reportlab.lib.pagesizes import letter
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib import colors
+    return letter, SimpleDocTemplate, Table, TableStyle, Paragraph, getSampleStyleSheet, ParagraphStyle, colors
+
+
+# Java probes are process-wide: their results land in globals and os.environ
+_java_available = None
+_java_env_configured = False
+_java_probe_lock = threading.Lock()
+
+# One in-process JVM runs JasperReports for every engine; JPype can only start it once
+_jvm_lock = threading.Lock()
+
+# JasperReports exporter and output classes per format; PDF goes through JasperExportManager
+_JASPER_EXPORTERS = {
+    'html': ('net.sf.jasperreports.engine.export.HtmlExporter', 'net.sf.jasperreports.export.SimpleHtmlExporterOutput'),
+    'xlsx': ('net.sf.jasperreports.engine.export.ooxml.JRXlsxExporter', 'net.sf.jasperreports.export.SimpleOutputStreamExporterOutput'),
+    'docx': ('net.sf.jasperreports.engine.export.ooxml.JRDocxExporter', 'net.sf.jasperreports.export.SimpleOutputStreamExporterOutput'),
+    'pptx': ('net.sf.jasperreports.engine.export.ooxml.JRPptxExporter', 'net.sf.jasperreports.export.SimpleOutputStreamExporterOutput'),
+    'odt': ('net.sf.jasperreports.engine.export.oasis.JROdtExporter', 'net.sf.jasperreports.export.SimpleOutputStreamExporterOutput'),
+    'ods': ('net.sf.jasperreports.engine.export.oasis.JROdsExporter', 'net.sf.jasperreports.export.SimpleOutputStreamExporterOutput'),
+    'csv': ('net.sf.jasperreports.engine.export.JRCsvExporter', 'net.sf.jasperreports.export.SimpleWriterExporterOutput'),
+    'rtf': ('net.sf.jasperreports.engine.export.JRRtfExporter', 'net.sf.jasperreports.export.SimpleWriterExporterOutput'),
+    'xml': ('net.sf.jasperreports.engine.export.JRXmlExporter', 'net.sf.jasperreports.export.SimpleXmlExporterOutput'),
+}
+
+
+def _start_jasper_jvm(extra_classpath=()):
+    """Start the shared JVM on first use and return the jpype module."""
+    import jpype
+    with _jvm_lock:
+        if not jpype.isJVMStarted():
+            import pyreportjasper
+            lib_path = os.path.join(os.path.dirname(pyreportjasper.__file__), 'libs')
+            # Same boot options as pyreportjasper, so its Report objects reuse this JVM too
+            jpype.startJVM(
+                "-Djava.system.class.loader=org.update4j.DynamicClassLoader",
+                classpath=[os.path.join(lib_path, '*'), os.path.join(lib_path, 'jdbc', '*'), *extra_classpath]
+            )
+    return jpype
+
 class JasperEngine:
     """JasperReports engine wrapper using pyreportjasper for proper JRXML processing."""
     
     def __init__(self):
         self.temp_dir = Path(tempfile.gettempdir()) / 'jasper_reports'
         self.temp_dir.mkdir(exist_ok=True)
+        _start_janitor(self.temp_dir)
+        # Parsed JRXML metadata keyed by content hash
+        self._jrxml_cache = LRUCache(JRXML_CACHE_SIZE)
+        # Compiled .jasper files keyed by JRXML hash; loaded reports also stay in memory. The
+        # directory is per user and private: .jasper files are Java-serialized, so one planted
+        # by another user would be deserialized by the JVM
+        self._compile_cache_dir = private_directory(
+            Path(tempfile.gettempdir()) / f'jasper_compiled_{os.getuid()}'
+        )
+        self._compiled_reports = LRUCache(COMPILED_CACHE_SIZE)
         self.java_available = self._check_java_availability()
         self.jdbc_dir = Path(__file__).parent / 'lib'
         self._setup_jdbc_classpath()
     
     def _setup_jdbc_classpath(self):
         """Set up JDBC driver classpath for JasperReports."""
+        global _java_env_configured
+        with _java_probe_lock:
+            if not _java_env_configured:
+                self._configure_java_env()
+                _java_env_configured = True
+    
+    def _configure_java_env(self):
+        """Point JAVA_HOME, PATH and CLASSPATH at a compatible JVM and the bundled JDBC drivers."""
+        self._configure_java_home()
+        
+        if not os.environ.get('CLASSPATH') and self.jdbc_dir.exists():
+            jdbc_jars = list(self.jdbc_dir.glob('*.jar'))
+            if jdbc_jars:
+                classpath = os.pathsep.join(str(jar) for jar in jdbc_jars)
+                os.environ['CLASSPATH'] = classpath
+                logger.info(f"JDBC classpath set: {classpath}")
+    
+    def _configure_java_home(self):
+        """Set JAVA_HOME unless the environment already points at a usable JDK."""
+        java_home = os.environ.get('JAVA_HOME')
+        if java_home and os.path.isdir(os.path.join(java_home, 'bin')):
+            # Already configured; skip the path probes and the JVM spawn below
+            logger.info(f"Using JAVA_HOME from environment: {java_home}")
+            return
+        
         # Try Java versions in order of compatibility (8 > 11 > system)
         java_homes = [
             "/usr/local/opt/openjdk@8/libexec/openjdk.jdk/Contents/Home",  # Homebrew Java 8
@@ -31,7 +230,6 @@ class JasperEngine:
             "/Library/Java/JavaVirtualMachines/openjdk-8.jdk/Contents/Home"  # System Java 8
         ]
         
-        java_home_set = False
         for java_home in java_homes:
             if os.path.exists(java_home):
                 os.environ['JAVA_HOME'] = java_home
@@ -39,34 +237,33 @@ class JasperEngine:
                 java_bin = os.path.join(java_home, 'bin')
                 current_path = os.environ.get('PATH', '')
                 if java_bin not in current_path:
-                    os.environ['PATH'] = f"{java_bin}:{current_path}"
+                    os.environ['PATH'] = f"{java_bin}{os.pathsep}{current_path}"
                 logger.info(f"JAVA_HOME set to compatible version: {java_home}")
-                java_home_set = True
-                break
+                return
         
-        if not java_home_set:
-            # Fallback to system Java
-            if not os.environ.get('JAVA_HOME'):
-                try:
-                    result = subprocess.run(['java', '-XshowSettings:properties', '-version'], 
-                                          capture_output=True, text=True, timeout=10)
-                    java_home_line = [line for line in result.stderr.split('\n') if 'java.home' in line]
-                    if java_home_line:
-                        java_home = java_home_line[0].split('=')[1].strip()
-                        os.environ['JAVA_HOME'] = java_home
-                        logger.info(f"JAVA_HOME set to system Java: {java_home}")
-                except Exception as e:
-                    logger.warning(f"Could not determine JAVA_HOME: {e}")
-        
-        if self.jdbc_dir.exists():
-            jdbc_jars = list(self.jdbc_dir.glob('*.jar'))
-            if jdbc_jars:
-                classpath = ':'.join(str(jar) for jar in jdbc_jars)
-                os.environ['CLASSPATH'] = classpath
-                logger.info(f"JDBC classpath set: {classpath}")
+        # Fallback to system Java
+        if not os.environ.get('JAVA_HOME'):
+            try:
+                result = subprocess.run(['java', '-XshowSettings:properties', '-version'], 
+                                      capture_output=True, text=True, timeout=10)
+                java_home_line = [line for line in result.stderr.split('\n') if 'java.home' in line]
+                if java_home_line:
+                    java_home = java_home_line[0].split('=')[1].strip()
+                    os.environ['JAVA_HOME'] = java_home
+                    logger.info(f"JAVA_HOME set to system Java: {java_home}")
+            except Exception as e:
+                logger.warning(f"Could not determine JAVA_HOME: {e}")
         
     def _check_java_availability(self):
         """Check if Java is available for JasperReports compilation."""
+        global _java_available
+        with _java_probe_lock:
+            if _java_available is None:
+                _java_available = self._probe_java()
+            return _java_available
+    
+    def _probe_java(self):
+        """Run `java -version` to see whether a JVM can be started."""
         try:
             result = subprocess.run(['java', '-version'], 
                                   capture_output=True, text=True, timeout=5)
@@ -92,103 +289,121 @@ class JasperEngine:
             # For now, use enhanced fallback system due to Java compatibility issues
             logger.info("Using enhanced JRXML preview system")
             
-            if output_format in ['html']:
-                return self._generate_html_fallback(jrxml_content, connection_string)
-            elif output_format == 'pdf':
-                return self._generate_pdf_fallback(jrxml_content, connection_string)
-            elif output_format in ['xlsx', 'excel']:
-                return self._generate_excel_fallback(jrxml_content, connection_string)
-            elif output_format == 'csv':
-                return self._generate_csv_fallback(jrxml_content, connection_string)
-            else:
-                return self._generate_html_fallback(jrxml_content, connection_string)
+            return self._fallback_generator(output_format)(jrxml_content, connection_string)
                     
         except Exception as e:
             error_msg = f"Report generation error: {str(e)}"
             logger.error(error_msg)
             return error_msg.encode('utf-8'), str(e)
     
+    def _fallback_generator(self, output_format):
+        """Return the fallback method that renders the given output format."""
+        if output_format == 'pdf':
+            return self._generate_pdf_fallback
+        elif output_format in ['xlsx', 'excel']:
+            return self._generate_excel_fallback
+        elif output_format == 'csv':
+            return self._generate_csv_fallback
+        return self._generate_html_fallback
+    
+    def _load_report(self, jrxml_content, connection_string):
+        """Return the (title_text, fields, data) a fallback renderer needs."""
+        title_text, fields, query = self._extract_jrxml_metadata(jrxml_content)
+        data = self._get_sample_data(connection_string, query, fields)
+        return title_text, fields, data
+    
     def _generate_with_pyreportjasper(self, jrxml_content, connection_string, output_format, parameters):
-        """Generate report using pyreportjasper."""
+        """Generate report with pyreportjasper's JasperReports jars in the shared in-process JVM."""
         try:
-            from pyreportjasper import PyReportJasper
-            
-            # Create temporary files
-            timestamp = os.getpid()
-            jrxml_file = self.temp_dir / f"report_{timestamp}.jrxml"
-            output_file = self.temp_dir / f"report_{timestamp}"
-            
-            # Write JRXML content to file
-            with open(jrxml_file, 'w', encoding='utf-8') as f:
-                f.write(jrxml_content)
-            
-            # Map format names to pyreportjasper supported formats
-            format_map = {
-                'html': 'html',
-                'pdf': 'pdf', 
-                'xlsx': 'xlsx',
-                'excel': 'xlsx',
-                'csv': 'csv',
-                'xml': 'xml',
-                'rtf': 'rtf',
-                'docx': 'docx',
-                'odt': 'odt',
-                'ods': 'ods',
-                'pptx': 'pptx'
-            }
-            
-            jasper_format = format_map.get(output_format, output_format)
-            
-            # Prepare configuration
-            config = {
-                'input_file': str(jrxml_file),
-                'output_file': str(output_file),
-                'output_formats': [jasper_format],
-                'parameters': parameters or {},
-                'locale': 'en_US'
-            }
-            
-            # Add database configuration if provided
-            if connection_string:
-                db_config = self._parse_connection_string(connection_string)
-                if db_config:
-                    config['db_connection'] = db_config
-            
-            # Create instance and process
-            pyjasper = PyReportJasper()
-            pyjasper.config(**config)
-            pyjasper.process_report()
-            
-            # Read the generated file
-            output_path = Path(f"{output_file}.{jasper_format}")
-            if output_path.exists():
-                with open(output_path, 'rb') as f:
-                    content = f.read()
-                
-                # Clean up temporary files
-                self._cleanup_temp_files([jrxml_file, output_path])
-                
-                return content, None
+            jdbc_jars = [str(jar) for jar in self.jdbc_dir.glob('*.jar')] if self.jdbc_dir.exists() else []
+            jpype = _start_jasper_jvm(jdbc_jars)
+            JClass = jpype.JClass
+            
+            jasper_report = self._compiled_report(jpype, jrxml_content)
+            
+            java_params = JClass('java.util.HashMap')()
+            for name, value in (parameters or {}).items():
+                java_params.put(name, value)
+            
+            fill_manager = JClass('net.sf.jasperreports.engine.JasperFillManager')
+            db_config = self._parse_connection_string(connection_string) if connection_string else None
+            if db_config:
+                driver_manager = JClass('java.sql.DriverManager')
+                if db_config.get('username') is None:
+                    connection = driver_manager.getConnection(db_config['jdbc_url'])
+                else:
+                    connection = driver_manager.getConnection(
+                        db_config['jdbc_url'], db_config['username'], db_config.get('password') or ''
+                    )
+                try:
+                    jasper_print = fill_manager.fillReport(jasper_report, java_params, connection)
+                finally:
+                    connection.close()
             else:
-                raise Exception(f"Output file not generated: {output_path}")
+                jasper_print = fill_manager.fillReport(
+                    jasper_report, java_params, JClass('net.sf.jasperreports.engine.JREmptyDataSource')()
+                )
+            
+            return self._export_jasper_print(jpype, jasper_print, output_format), None
                 
         except Exception as e:
             logger.error(f"pyreportjasper error: {e}")
             raise
     
+    def _compiled_report(self, jpype, jrxml_content):
+        """Return the compiled JasperReport for a JRXML, compiling only on a cache miss."""
+        JClass = jpype.JClass
+        payload = jrxml_content if isinstance(jrxml_content, bytes) else jrxml_content.encode('utf-8')
+        key = hashlib.blake2b(payload, digest_size=16).hexdigest()
+        jasper_report = self._compiled_reports.get(key)
+        if jasper_report is not None:
+            return jasper_report
+        
+        cached = self._compile_cache_dir / f'{key}.jasper'
+        if cached.exists():
+            jasper_report = JClass('net.sf.jasperreports.engine.util.JRLoader').loadObjectFromFile(str(cached))
+        else:
+            # Compile straight from memory, then publish the .jasper atomically for other workers
+            jasper_report = JClass('net.sf.jasperreports.engine.JasperCompileManager').compileReport(
+                JClass('java.io.ByteArrayInputStream')(payload)
+            )
+            fd, tmp_path = tempfile.mkstemp(prefix=f'{key}_', suffix='.tmp', dir=str(self._compile_cache_dir))
+            os.close(fd)
+            try:
+                JClass('net.sf.jasperreports.engine.util.JRSaver').saveObject(jasper_report, tmp_path)
+                os.replace(tmp_path, cached)
+            except Exception:
+                _unlink_quietly(Path(tmp_path))
+                raise
+        
+        self._compiled_reports.put(key, jasper_report)
+        return jasper_report
+    
+    def _export_jasper_print(self, jpype, jasper_print, output_format):
+        """Export a filled report to bytes in the requested format."""
+        JClass = jpype.JClass
+        jasper_format = 'xlsx' if output_format == 'excel' else output_format
+        if jasper_format == 'pdf':
+            return bytes(JClass('net.sf.jasperreports.engine.JasperExportManager').exportReportToPdf(jasper_print))
+        
+        if jasper_format not in _JASPER_EXPORTERS:
+            raise Exception(f"Unsupported output format: {output_format}")
+        exporter_class, output_class = _JASPER_EXPORTERS[jasper_format]
+        stream = JClass('java.io.ByteArrayOutputStream')()
+        exporter = JClass(exporter_class)()
+        exporter.setExporterInput(JClass('net.sf.jasperreports.export.SimpleExporterInput')(jasper_print))
+        exporter.setExporterOutput(JClass(output_class)(stream))
+        exporter.exportReport()
+        return bytes(stream.toByteArray())
+    
     def _generate_with_pyjasper(self, jrxml_content, connection_string, output_format, parameters):
         """Generate report using pyjasper."""
         try:
             import pyjasper
             
             # Create temporary files
-            timestamp = os.getpid()
-            jrxml_file = self.temp_dir / f"report_{timestamp}.jrxml"
-            output_file = self.temp_dir / f"report_{timestamp}"
-            
-            # Write JRXML content to file
-            with open(jrxml_file, 'w', encoding='utf-8') as f:
-                f.write(jrxml_content)
+            jrxml_file = self._write_temp_jrxml(jrxml_content)
+            output_file = jrxml_file.with_suffix('')
             
             # Prepare database connection
             db_config = None
@@ -232,6 +447,17 @@ class JasperEngine:
             logger.error(f"pyjasper error: {e}")
             raise
     
+    def _write_temp_jrxml(self, jrxml_content):
+        """Write JRXML to a uniquely named temp file and return its path."""
+        payload = jrxml_content if isinstance(jrxml_content, bytes) else jrxml_content.encode('utf-8')
+        # mkstemp names are unique, so concurrent reports in one process don't share a file
+        fd, jrxml_path = tempfile.mkstemp(prefix='report_', suffix='.jrxml', dir=str(self.temp_dir))
+        try:
+            os.write(fd, payload)
+        finally:
+            os.close(fd)
+        return Path(jrxml_path)
+    
     def _parse_connection_string(self, connection_string):
         """Parse connection string to database configuration."""
         try:
@@ -278,15 +504,8 @@ class JasperEngine:
         return None
     
     def _cleanup_temp_files(self, files):
-        """Clean up temporary files."""
-        for file_path in files:
-            try:
-                if isinstance(file_path, Path):
-                    file_path.unlink(missing_ok=True)
-                else:
-                    Path(file_path).unlink(missing_ok=True)
-            except Exception as e:
-                logger.warning(f"Could not delete temp file {file_path}: {e}")
+        """Queue temporary files for deletion by the background janitor."""
+        _pending_unlinks.extend(Path(file_path) for file_path in files)
     
     def _generate_fallback_message(self, message):
         """Generate a fallback HTML message."""
@@ -356,61 +575,7 @@ class JasperEngine:
     def _generate_html_fallback(self, jrxml_content, connection_string):
         """Generate HTML fallback when JasperReports engine fails."""
         try:
-            import xml.etree.ElementTree as ET
-            import sqlite3
-            
-            # Parse JRXML
-            root = ET.fromstring(jrxml_content)
-            
-            # Extract namespace
-            ns = {'jr': 'http://jasperreports.sourceforge.net/jasperreports'}
-            if root.tag.startswith('{'):
-                ns_url = root.tag[1:root.tag.index('}')]
-                ns = {'jr': ns_url}
-            
-            # Extract title from title band
-            title_text = None
-            title_band = root.find('.//jr:title', ns)
-            if title_band is None:
-                title_band = root.find('.//title')
-            
-            if title_band is not None:
-                # Find static text elements in title band
-                static_texts = title_band.findall('.//jr:staticText/jr:text', ns)
-                if not static_texts:
-                    static_texts = title_band.findall('.//staticText/text')
-                
-                for text_elem in static_texts:
-                    if text_elem.text and text_elem.text.strip():
-                        title_text = text_elem.text.strip()
-                        break
-            
-            # Extract fields
-            fields = {}
-            field_elements = root.findall('.//jr:field', ns)
-            if not field_elements:
-                field_elements = root.findall('.//field')
-            
-            for field in field_elements:
-                name = field.get('name')
-                field_class = field.get('class', 'java.lang.String')
-                if name:
-                    fields[name] = field_class
-            
-            # Extract query
-            query = ""
-            query_elem = root.find('.//jr:queryString', ns)
-            if query_elem is None:
-                query_elem = root.find('.//queryString')
-            
-            if query_elem is not None and query_elem.text:
-                query = query_elem.text.strip()
-                # Remove CDATA wrapper if present
-                if query.startswith('<![CDATA[') and query.endswith(']]>'):
-                    query = query[9:-3]
-            
-            # Get sample data
-            data = self._get_sample_data(connection_string, query, fields)
+            title_text, fields, data = self._load_report(jrxml_content, connection_string)
             
             # Generate HTML
             html = self._generate_preview_html(title_text, fields, data)
@@ -421,64 +586,122 @@ class JasperEngine:
             logger.error(f"HTML fallback generation error: {e}")
             return self._generate_fallback_message(f"Preview generation failed: {str(e)}"), str(e)
     
+    def _extract_jrxml_metadata(self, jrxml_content):
+        """Parse JRXML once and return its (title_text, fields, query), cached by content hash."""
+        key = hashlib.blake2b(jrxml_content.encode('utf-8'), digest_size=16).digest()
+        cached = self._jrxml_cache.get(key)
+        if cached is not None:
+            return cached
+        
+        title_text = None
+        fields = {}
+        query = None
+        in_title = False
+        if '<!ENTITY' in jrxml_content:
+            # Entities need the full parse, which expands internal ones and refuses external ones
+            events = etree.iterwalk(_parse_xml(jrxml_content), events=('start', 'end'))
+        else:
+            # Stream the document, dropping each element once read; only the first title band is
+            # searched. The text is re-encoded as UTF-8, so its own encoding declaration must go
+            content = _XML_DECLARATION_RE.sub('', jrxml_content, count=1).encode('utf-8')
+            events = etree.iterparse(BytesIO(content), events=('start', 'end'),
+                                     resolve_entities=False, no_network=True, collect_ids=False)
+        for event, elem in events:
+            tag = elem.tag.rsplit('}', 1)[-1]
+            if event == 'start':
+                if tag == 'title':
+                    in_title = True
+                continue
+            
+            if tag == 'field':
+                name = elem.get('name')
+                if name:
+                    fields[name] = elem.get('class', 'java.lang.String')
+            elif tag == 'queryString':
+                if query is None:
+                    query = (elem.text or '').strip()
+            elif tag == 'text' and in_title:
+                if (title_text is None and elem.getparent().tag.rsplit('}', 1)[-1] == 'staticText'
+                        and elem.text and elem.text.strip()):
+                    title_text = elem.text.strip()
+            elif tag == 'title':
+                # Fields and the query precede the bands, so the rest of the file isn't needed
+                break
+            elem.clear()
+        
+        # Drop a literal CDATA wrapper and the whitespace around it
+        query = (query or '').removeprefix('<![CDATA[').removesuffix(']]>').strip()
+        
+        metadata = (title_text, fields, query)
+        self._jrxml_cache.put(key, metadata)
+        return metadata
+    
     def _get_sample_data(self, connection_string, query, fields):
-        """Get data for the report from database or sample data."""
-        if connection_string and connection_string.startswith('sqlite:///') and query:
-            try:
-                db_path = connection_string.replace('sqlite:///', '')
-                if os.path.exists(db_path):
-                    conn = sqlite3.connect(db_path)
-                    cursor = conn.cursor()
-                    cursor.execute(query)
-                    columns = [description[0] for description in cursor.description]
-                    rows = cursor.fetchall()
-                    
-                    data = []
-                    for row in rows:
-                        row_dict = {}
-                        for i, col in enumerate(columns):
-                            row_dict[col] = row[i] if i < len(row) else None
-                        data.append(row_dict)
-                    
-                    conn.close()
-                    return data
-            except Exception as e:
-                logger.warning(f"Database query error: {e}")
+        """Get report rows, as value tuples in field order, from the database or sample data."""
+        try:
+            return list(self._iter_report_rows(connection_string, query, fields))
+        except Exception as e:
+            # The query failed after its first rows were read; use sample data as for any failure
+            logger.warning(f"Database query error: {e}")
+            return list(self._iter_sample_rows(fields))
+    
+    def _iter_report_rows(self, connection_string, query, fields):
+        """Yield report rows like _get_sample_data, streaming database results in batches.
+        
+        A query failing before any row is read falls back to sample data; a later failure is
+        raised, as rows already yielded can't be taken back.
+        """
+        cursor = self._open_report_query(connection_string, query)
+        if cursor is not None:
+            with closing(cursor.connection):
+                try:
+                    # Pick field columns by position from the plain result tuples; no per-row dict
+                    getter = _field_row_getter(tuple(fields), [column[0] for column in cursor.description])
+                    batch = cursor.fetchmany()
+                except Exception as e:
+                    logger.warning(f"Database query error: {e}")
+                else:
+                    while batch:
+                        yield from map(getter, batch)
+                        batch = cursor.fetchmany()
+                    return
         
-        # Return sample data based on fields
+        yield from self._iter_sample_rows(fields)
+    
+    def _iter_sample_rows(self, fields):
+        """Yield SAMPLE_ROW_COUNT made-up rows for the fields."""
         if fields:
-            sample_data = []
-            for i in range(5):  # Generate 5 sample rows
-                row = {}
-                for field_name, field_type in fields.items():
-                    if 'id' in field_name.lower():
-                        row[field_name] = i + 1
-                    elif 'name' in field_name.lower():
-                        row[field_name] = f'Sample Name {i + 1}'
-                    elif 'email' in field_name.lower():
-                        row[field_name] = f'user{i + 1}@example.com'
-                    elif 'date' in field_name.lower():
-                        row[field_name] = f'2024-0{(i % 12) + 1}-{(i % 28) + 1:02d}'
-                    elif 'amount' in field_name.lower() or 'salary' in field_name.lower():
-                        row[field_name] = (i + 1) * 1000 + 500
-                    elif 'department' in field_name.lower():
-                        departments = ['IT', 'Sales', 'HR', 'Finance', 'Marketing']
-                        row[field_name] = departments[i % len(departments)]
-                    else:
-                        row[field_name] = f'Sample {field_name} {i + 1}'
-                sample_data.append(row)
-            return sample_data
+            # Build each column in one go, then transpose into rows
+            columns = [_sample_column_builder(name)(SAMPLE_ROW_COUNT, name) for name in fields]
+            yield from zip(*columns)
+    
+    def _open_report_query(self, connection_string, query):
+        """Run the report query on its SQLite database; None when there is none or the query fails."""
+        if not (connection_string and connection_string.startswith('sqlite:///') and query):
+            return None
+        db_path = connection_string.replace('sqlite:///', '')
+        if not os.path.exists(db_path):
+            return None
         
-        return []
+        conn = sqlite3.connect(db_path)
+        try:
+            cursor = conn.execute(query)
+        except Exception as e:
+            conn.close()
+            logger.warning(f"Database query error: {e}")
+            return None
+        # fetchmany() pulls this many rows per call, bounding how many are held at once
+        cursor.arraysize = DB_FETCH_BATCH_SIZE
+        return cursor
     
     def _generate_preview_html(self, title_text, fields, data):
         """Generate HTML preview with proper title display."""
-        html = f"""
+        parts = [f"""
 <!DOCTYPE html>
 <html>
 <head>
     <meta charset="UTF-8">
-    <title>{title_text if title_text else 'Report Preview'}</title>
+    <title>{title_text.translate(_HTML_ESCAPE) if title_text else 'Report Preview'}</title>
     <style>
         body {{ font-family: 'Times New Roman', serif; margin: 20px; }}
         .report-container {{ max-width: 800px; margin: 0 auto; }}
@@ -498,100 +721,65 @@ class JasperEngine:
             <strong>Note:</strong> This is a preview generated using JRXML parsing. 
             For exact JasperReports output, ensure Java compatibility with the JasperReports engine.
         </div>
-"""
+"""]
         
         # Add title if it exists in the JRXML
         if title_text:
-            html += f'        <div class="report-title">{title_text}</div>\n'
+            parts.append(f'        <div class="report-title">{title_text.translate(_HTML_ESCAPE)}</div>\n')
         
         # Add data table
         if data and fields:
-            html += """
+            field_names = tuple(fields)
+            is_currency = [_is_currency_field(name) for name in field_names]
+            
+            parts.append("""
         <table>
             <thead>
                 <tr>
-"""
-            for field_name in fields.keys():
-                display_name = field_name.replace('_', ' ').title()
-                html += f"                    <th>{display_name}</th>\n"
+""")
+            for label in _header_labels(field_names):
+                display_name = label.translate(_HTML_ESCAPE)
+                parts.append(f"                    <th>{display_name}</th>\n")
             
-            html += """
+            parts.append("""
                 </tr>
             </thead>
             <tbody>
-"""
+""")
             
-            for row in data:
-                html += "                <tr>\n"
-                for field_name in fields.keys():
-                    value = row.get(field_name, '')
-                    if 'amount' in field_name.lower() or 'salary' in field_name.lower():
+            for values in data:
+                parts.append("                <tr>\n")
+                for value, currency in zip(values, is_currency):
+                    if currency:
                         try:
                             amount_val = float(value) if value else 0.0
-                            html += f'                    <td class="currency">${amount_val:.2f}</td>\n'
+                            parts.append(f'                    <td class="currency">${amount_val:.2f}</td>\n')
                         except (ValueError, TypeError):
-                            html += f'                    <td class="currency">{value}</td>\n'
+                            parts.append(f'                    <td class="currency">{str(value).translate(_HTML_ESCAPE)}</td>\n')
                     else:
-                        html += f"                    <td>{value}</td>\n"
-                html += "                </tr>\n"
+                        parts.append(f"                    <td>{str(value).translate(_HTML_ESCAPE)}</td>\n")
+                parts.append("                </tr>\n")
             
-            html += """
+            parts.append("""
             </tbody>
         </table>
-"""
+""")
         
-        html += """
+        parts.append("""
     </div>
 </body>
 </html>
-"""
+""")
         
-        return html
+        return ''.join(parts)
     
     def _generate_pdf_fallback(self, jrxml_content, connection_string):
         """Generate PDF using reportlab as fallback."""
         try:
-            from reportlab.lib.pagesizes import letter
-            from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-            from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-            from reportlab.lib import colors
-            from reportlab.lib.units import inch
-            import xml.etree.ElementTree as ET
-            
-            # Parse JRXML to extract title and data structure
-            root = ET.fromstring(jrxml_content)
-            ns = {'jr': 'http://jasperreports.sourceforge.net/jasperreports'}
-            if root.tag.startswith('{'):
-                ns_url = root.tag[1:root.tag.index('}')]
-                ns = {'jr': ns_url}
-            
-            # Extract title
-            title_text = None
-            title_band = root.find('.//jr:title', ns) or root.find('.//title')
-            if title_band is not None:
-                static_texts = title_band.findall('.//jr:staticText/jr:text', ns) or title_band.findall('.//staticText/text')
-                for text_elem in static_texts:
-                    if text_elem.text and text_elem.text.strip():
-                        title_text = text_elem.text.strip()
-                        break
-            
-            # Extract fields
-            fields = {}
-            field_elements = root.findall('.//jr:field', ns) or root.findall('.//field')
-            for field in field_elements:
-                name = field.get('name')
-                if name:
-                    fields[name] = field.get('class', 'java.lang.String')
+            (letter, SimpleDocTemplate, Table, TableStyle, Paragraph,
+             getSampleStyleSheet, ParagraphStyle, colors) = _load_reportlab()
             
-            # Get data
-            query = ""
-            query_elem = root.find('.//jr:queryString', ns) or root.find('.//queryString')
-            if query_elem is not None and query_elem.text:
-                query = query_elem.text.strip()
-                if query.startswith('<![CDATA[') and query.endswith(']]>'):
-                    query = query[9:-3]
-            
-            data = self._get_sample_data(connection_string, query, fields)
+            title_text, fields, data = self._load_report(jrxml_content, connection_string)
             
             buffer = BytesIO()
             doc = SimpleDocTemplate(buffer, pagesize=letter)
@@ -608,7 +796,8 @@ class JasperEngine:
                     spaceAfter=30,
                     alignment=1  # Center
                 )
-                story.append(Paragraph(title_text, title_style))
+                # Paragraph text is markup, so escape it like HTML
+                story.append(Paragraph(title_text.translate(_HTML_ESCAPE), title_style))
             
             # Add notice
             notice_style = ParagraphStyle(
@@ -626,13 +815,14 @@ class JasperEngine:
             
             # Create table
             if data and fields:
-                table_data = [[field.replace('_', ' ').title() for field in fields.keys()]]
+                field_names = tuple(fields)
+                table_data = [list(_header_labels(field_names))]
+                is_currency = [_is_currency_field(field_name) for field_name in field_names]
                 
-                for row in data:
+                for values in data:
                     data_row = []
-                    for field_name in fields.keys():
-                        value = row.get(field_name, '')
-                        if 'amount' in field_name.lower() or 'salary' in field_name.lower():
+                    for value, currency in zip(values, is_currency):
+                        if currency:
                             try:
                                 amount_val = float(value) if value else 0.0
                                 data_row.append(f'${amount_val:.2f}')
@@ -656,7 +846,7 @@ class JasperEngine:
                 story.append(table)
             
             doc.build(story)
-            buffer.seek(0)
+            # getvalue() hands back BytesIO's own bytes object while nothing else views the buffer
             return buffer.getvalue(), None
             
         except Exception as e:
@@ -664,134 +854,101 @@ class JasperEngine:
             return None, f"PDF generation error: {str(e)}"
     
     def _generate_excel_fallback(self, jrxml_content, connection_string):
-        """Generate Excel using openpyxl as fallback."""
+        """Generate Excel using xlsxwriter as fallback."""
         try:
-            from openpyxl import Workbook
-            from openpyxl.styles import Font, PatternFill
-            import xml.etree.ElementTree as ET
-            
-            # Parse JRXML
-            root = ET.fromstring(jrxml_content)
-            ns = {'jr': 'http://jasperreports.sourceforge.net/jasperreports'}
-            if root.tag.startswith('{'):
-                ns_url = root.tag[1:root.tag.index('}')]
-                ns = {'jr': ns_url}
-            
-            # Extract title and fields
-            title_text = None
-            title_band = root.find('.//jr:title', ns) or root.find('.//title')
-            if title_band is not None:
-                static_texts = title_band.findall('.//jr:staticText/jr:text', ns) or title_band.findall('.//staticText/text')
-                for text_elem in static_texts:
-                    if text_elem.text and text_elem.text.strip():
-                        title_text = text_elem.text.strip()
-                        break
-            
-            fields = {}
-            field_elements = root.findall('.//jr:field', ns) or root.findall('.//field')
-            for field in field_elements:
-                name = field.get('name')
-                if name:
-                    fields[name] = field.get('class', 'java.lang.String')
+            import xlsxwriter
             
-            # Get data
-            query = ""
-            query_elem = root.find('.//jr:queryString', ns) or root.find('.//queryString')
-            if query_elem is not None and query_elem.text:
-                query = query_elem.text.strip()
-                if query.startswith('<![CDATA[') and query.endswith(']]>'):
-                    query = query[9:-3]
+            title_text, fields, data = self._load_report(jrxml_content, connection_string)
+            headers = _header_labels(tuple(fields))
             
-            data = self._get_sample_data(connection_string, query, fields)
-            
-            wb = Workbook()
-            ws = wb.active
-            ws.title = "Report"
+            # The Rust writer takes records keyed by header (distinct headers, at least one row)
+            if data and headers and len(set(headers)) == len(headers):
+                content = self._write_excel_rust(title_text, headers, data)
+                if content is not None:
+                    return content, None
             
-            row = 1
+            # constant_memory flushes each row as the next one starts instead of keeping every cell
+            buffer = BytesIO()
+            wb = xlsxwriter.Workbook(buffer, {'constant_memory': True, 'strings_to_urls': False})
+            ws = wb.add_worksheet("Report")
+            row_idx = 0
             
             # Add title
             if title_text:
-                ws[f'A{row}'] = title_text
-                ws[f'A{row}'].font = Font(bold=True, size=16)
-                row += 2
+                ws.write(row_idx, 0, title_text, wb.add_format({'bold': True, 'font_size': 16}))
+                row_idx += 2
             
             # Add notice
-            ws[f'A{row}'] = "Note: Generated using JRXML parsing"
-            ws[f'A{row}'].font = Font(italic=True, size=10)
-            row += 2
+            ws.write(row_idx, 0, "Note: Generated using JRXML parsing", wb.add_format({'italic': True, 'font_size': 10}))
+            row_idx += 2
             
             # Add headers
             if fields:
-                col = 1
-                for field_name in fields.keys():
-                    ws.cell(row=row, column=col, value=field_name.replace('_', ' ').title())
-                    ws.cell(row=row, column=col).font = Font(bold=True)
-                    col += 1
-                row += 1
+                ws.write_row(row_idx, 0, headers, wb.add_format({'bold': True}))
+                row_idx += 1
                 
-                # Add data
-                for row_data in data:
-                    col = 1
-                    for field_name in fields.keys():
-                        value = row_data.get(field_name, '')
-                        ws.cell(row=row, column=col, value=value)
-                        col += 1
-                    row += 1
+                # Add data, one bulk write per row
+                write_row = ws.write_row
+                for row_idx, values in enumerate(data, start=row_idx):
+                    write_row(row_idx, 0, values)
             
-            buffer = BytesIO()
-            wb.save(buffer)
-            buffer.seek(0)
+            wb.close()
             return buffer.getvalue(), None
             
         except Exception as e:
             logger.error(f"Excel fallback generation error: {e}")
             return None, f"Excel generation error: {str(e)}"
     
+    def _write_excel_rust(self, title_text, headers, data):
+        """Write the Excel fallback with rustpy-xlsxwriter, or return None when it isn't installed."""
+        try:
+            from rustpy_xlsxwriter import FastExcel, Format
+        except ImportError:
+            return None
+        
+        # Title and notice go in merged banner rows above the header; Excel can't merge a single cell
+        last_col = max(len(headers), 2) - 1
+        banners = []
+        header_row = 2
+        if title_text:
+            banners.append((0, 0, 0, last_col, title_text, Format().set_bold().set_font_size(16)))
+            header_row += 2
+        banners.append((header_row - 2, 0, header_row - 2, last_col,
+                        "Note: Generated using JRXML parsing", Format().set_italic().set_font_size(10)))
+        
+        buffer = BytesIO()
+        FastExcel(buffer, autofit=False).sheet(
+            "Report", (dict(zip(headers, values)) for values in data),
+            header_row=header_row, header_format=Format().set_bold(), merge_ranges=banners
+        ).save()
+        return buffer.getvalue()
+    
     def _generate_csv_fallback(self, jrxml_content, connection_string):
         """Generate CSV as fallback."""
         try:
             import csv
-            from io import StringIO
-            import xml.etree.ElementTree as ET
-            
-            # Parse JRXML
-            root = ET.fromstring(jrxml_content)
-            ns = {'jr': 'http://jasperreports.sourceforge.net/jasperreports'}
-            if root.tag.startswith('{'):
-                ns_url = root.tag[1:root.tag.index('}')]
-                ns = {'jr': ns_url}
-            
-            fields = {}
-            field_elements = root.findall('.//jr:field', ns) or root.findall('.//field')
-            for field in field_elements:
-                name = field.get('name')
-                if name:
-                    fields[name] = field.get('class', 'java.lang.String')
-            
-            # Get data
-            query = ""
-            query_elem = root.find('.//jr:queryString', ns) or root.find('.//queryString')
-            if query_elem is not None and query_elem.text:
-                query = query_elem.text.strip()
-                if query.startswith('<![CDATA[') and query.endswith(']]>'):
-                    query = query[9:-3]
-            
-            data = self._get_sample_data(connection_string, query, fields)
-            
-            output = StringIO()
-            
-            if fields:
-                writer = csv.writer(output)
+            from io import TextIOWrapper
+            
+            # Nothing else reads the rows, so stream them from the query straight into the writer
+            _, fields, query = self._extract_jrxml_metadata(jrxml_content)
+            # closing() ends the query, and releases its connection, even if writing fails midway
+            with closing(self._iter_report_rows(connection_string, query, fields)) as data:
+                # Encode as rows are written rather than building a str and encoding it at the end
+                buffer = BytesIO()
+                output = TextIOWrapper(buffer, encoding='utf-8', newline='')
                 
-                # Write header
-                writer.writerow([field.replace('_', ' ').title() for field in fields.keys()])
-                
-                # Write data
-                for row in data:
-                    writer.writerow([row.get(field, '') for field in fields.keys()])
+                if fields:
+                    writer = csv.writer(output, lineterminator='\n')
+                    
+                    # Write header
+                    writer.writerow(_header_labels(tuple(fields)))
+                    
+                    # Write data
+                    writer.writerows(data)
             
-            return output.getvalue().encode('utf-8'), None
+            # detach() flushes the pending text and leaves the buffer open when the wrapper is collected
+            output.detach()
+            return buffer.getvalue(), None
             
         except Exception as e:
             logger.error(f"CSV fallback generation error: {e}")
@@ -1,19 +1,114 @@
 import json
+import logging
 import os
+import threading
+import time
+from collections import OrderedDict
 from pathlib import Path
-from sqlalchemy import create_engine, text
+from sqlalchemy import bindparam, create_engine, text
+from sqlalchemy.ext import baked
 from flask import current_app
 
 from utils.llm_client import LLMClient
 from config import db
-from .models import DatabaseConnection
-import sys
-import os
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from .models import CONNECTION_COLUMNS, DatabaseConnection
 from pyjasper_lib_integration import pyjasper_integration
 
+logger = logging.getLogger(__name__)
+
 SETTINGS_DIR = Path('settings')
 CONNECTION_FILE = SETTINGS_DIR / 'database_connections.json'
+# Sample schema SQL from the first LLM round-trip; replayed by later create_sample_db calls
+SAMPLE_SCHEMA_FILE = SETTINGS_DIR / 'sample_schema.sql'
+
+# Seconds a looked-up connection string is reused; edits made by other workers show up after this
+CONNECTION_STRING_TTL = 30
+
+# Engines for tested connection strings, least recently used first; evicted ones are disposed so
+# their pooled connections close rather than waiting for garbage collection
+ENGINE_CACHE_SIZE = 32
+_engines = OrderedDict()
+_engines_lock = threading.Lock()
+
+# Connection string per database type, filled from the save_connection arguments
+_CONNECTION_STRING_TEMPLATES = {
+    'sqlite': 'sqlite:///{database_name}',
+    'mysql': 'mysql://{username}:{password}@{host}:{port}/{database_name}',
+    'postgresql': 'postgresql://{username}:{password}@{host}:{port}/{database_name}',
+}
+
+# Baked queries: the SQL for these lookups is compiled once and reused on every call
+bakery = baked.bakery()
+
+# Listings only read column values, so they select plain rows instead of building ORM instances
+_active_connections_query = bakery(
+    lambda s: s.query(*(getattr(DatabaseConnection, column) for column in CONNECTION_COLUMNS))
+)
+_active_connections_query += lambda q: q.filter_by(is_active=True)
+
+_active_connection_strings_query = bakery(
+    lambda s: s.query(DatabaseConnection.name, DatabaseConnection.connection_string)
+)
+_active_connection_strings_query += lambda q: q.filter_by(is_active=True)
+
+_connection_by_name_query = bakery(lambda s: s.query(DatabaseConnection))
+_connection_by_name_query += lambda q: q.filter(DatabaseConnection.name == bindparam('name'))
+
+
+_FALLBACK_NOTICE_OPEN = b'<div class="fallback-notice">'
+
+
+def strip_fallback_notices(html):
+    """Remove each fallback-notice div from HTML bytes up to its first closing tag, using bytes.find scans."""
+    start = html.find(_FALLBACK_NOTICE_OPEN)
+    if start == -1:
+        return html
+    
+    pieces = []
+    pos = 0
+    while start != -1:
+        end = html.find(b'</div>', start + len(_FALLBACK_NOTICE_OPEN))
+        if end == -1:
+            break
+        pieces.append(html[pos:start])
+        pos = end + len(b'</div>')
+        start = html.find(_FALLBACK_NOTICE_OPEN, pos)
+    pieces.append(html[pos:])
+    return b''.join(pieces)
+
+
+def _get_engine(connection_string):
+    """Return a pooled engine for a connection string, created once and reused."""
+    with _engines_lock:
+        engine = _engines.get(connection_string)
+        if engine is not None:
+            _engines.move_to_end(connection_string)
+            return engine
+        # pre-ping checks a pooled connection is still alive before handing it out
+        engine = _engines[connection_string] = create_engine(connection_string, pool_pre_ping=True)
+        evicted = _engines.popitem(last=False)[1] if len(_engines) > ENGINE_CACHE_SIZE else None
+    if evicted is not None:
+        evicted.dispose()
+    return engine
+
+
+def _dispose_engine(connection_string):
+    """Drop the cached engine for a connection string and close its pooled connections."""
+    with _engines_lock:
+        engine = _engines.pop(connection_string, None)
+    if engine is not None:
+        engine.dispose()
+
+
+def fast_scalar_col(sql, params=()):
+    """Run a single-column query on a raw DB-API connection, skipping ORM row processing."""
+    conn = db.engine.raw_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
+    finally:
+        conn.close()
 
 
 class JasperManager:
@@ -23,26 +118,29 @@ class JasperManager:
             with open(CONNECTION_FILE, 'w') as f:
                 json.dump({}, f)
         self.llm = LLMClient()
+        # connection id -> (expiry, connection string), filled by get_connection_string
+        self._connection_strings = {}
 
     def load_connections(self):
-        connections = DatabaseConnection.query.filter_by(is_active=True).all()
-        return {conn.name: conn.connection_string for conn in connections}
+        # Only the two columns are loaded; rows are plain (name, connection_string) tuples
+        return dict(_active_connection_strings_query(db.session()).all())
 
     def save_connection(self, name, database_type, host=None, port=None, 
                        database_name=None, username=None, password=None, 
                        connection_string=None):
         if not connection_string:
-            if database_type == 'sqlite':
-                connection_string = f'sqlite:///{database_name}'
-            elif database_type == 'mysql':
-                connection_string = f'mysql://{username}:{password}@{host}:{port}/{database_name}'
-            elif database_type == 'postgresql':
-                connection_string = f'postgresql://{username}:{password}@{host}:{port}/{database_name}'
-            else:
+            template = _CONNECTION_STRING_TEMPLATES.get(database_type)
+            if template is None:
                 raise ValueError(f"Unsupported database type: {database_type}")
+            connection_string = template.format(
+                host=host, port=port, database_name=database_name,
+                username=username, password=password
+            )
         
-        existing = DatabaseConnection.query.filter_by(name=name).first()
+        existing = _connection_by_name_query(db.session()).params(name=name).first()
         if existing:
+            if existing.connection_string != connection_string:
+                _dispose_engine(existing.connection_string)
             existing.database_type = database_type
             existing.host = host
             existing.port = port
@@ -64,6 +162,7 @@ class JasperManager:
             db.session.add(connection)
         
         db.session.commit()
+        self._connection_strings.clear()
         return connection_string
 
     def create_sample_db(self, db_path='sample.db'):
@@ -76,7 +175,20 @@ class JasperManager:
             os.remove(db_path)
             
         conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
+        try:
+            if SAMPLE_SCHEMA_FILE.exists():
+                # Known-good statements from an earlier run, parsed and run as one transaction
+                conn.executescript(f'BEGIN;\n{SAMPLE_SCHEMA_FILE.read_text()}\n;COMMIT;')
+            else:
+                self._create_sample_schema(conn)
+        finally:
+            conn.close()
+        self.save_connection('sample', 'sqlite', database_name=db_path)
+        return db_path
+
+    def _create_sample_schema(self, conn):
+        """Build the sample schema from LLM SQL and cache the statements that ran."""
+        import sqlite3
         
         # Ask LLM for simple example tables
         prompt = (
@@ -84,22 +196,34 @@ class JasperManager:
             " customers(id integer primary key, name text) and orders(id integer"
             " primary key, customer_id integer, amount real)."
         )
-        sql = self.llm.getcompletion(prompt)
+        sql = self.llm.getcompletion(prompt).strip()
+        
+        # Run the whole script as one transaction; SQLite's tokenizer handles ';' inside literals
+        try:
+            conn.executescript(f'BEGIN;\n{sql}\n;COMMIT;')
+        except sqlite3.Error as e:
+            logger.warning('SQL script error, retrying statement by statement: %s', e)
+            conn.rollback()
+        else:
+            SAMPLE_SCHEMA_FILE.write_text(f'{sql}\n')
+            return
         
+        cursor = conn.cursor()
+        applied = []
         for stmt in sql.split(';'):
             stmt = stmt.strip()
             if stmt:
                 try:
                     cursor.execute(stmt)
+                    applied.append(stmt)
                 except sqlite3.Error as e:
                     # Log the error but continue with other statements
-                    print(f"SQL execution error: {e}")
+                    logger.warning('SQL execution error: %s', e)
                     continue
                     
         conn.commit()
-        conn.close()
-        self.save_connection('sample', 'sqlite', database_name=db_path)
-        return db_path
+        if applied:
+            SAMPLE_SCHEMA_FILE.write_text(''.join(f'{stmt};\n' for stmt in applied))
 
     def regenerate_jrxml(self, prompt, image=None):
         """Return new jrxml text from LLM based on prompt and optional image."""
@@ -124,55 +248,97 @@ class JasperManager:
                 return f"<div class='alert alert-danger'>Report generation error: {error}</div>"
             
             if content:
-                # Extract body content from the generated HTML
-                html_str = content.decode('utf-8')
-                
-                # Remove the fallback notice if present
-                import re
-                html_str = re.sub(r'<div class="fallback-notice">.*?</div>', '', html_str, flags=re.DOTALL)
+                # Work on the raw bytes; only the slice that is returned gets decoded
+                html = strip_fallback_notices(content)
                 
                 # Extract the report container content
-                body_start = html_str.find('<div class="report-container">')
-                body_end = html_str.find('</div>', body_start) + 6 if body_start != -1 else -1
+                body_start = html.find(b'<div class="report-container">')
+                body_end = html.find(b'</div>', body_start) if body_start != -1 else -1
                 
-                if body_start != -1 and body_end != -1:
-                    return html_str[body_start:body_end]
+                if body_end != -1:
+                    return html[body_start:body_end + 6].decode('utf-8')
                 else:
                     # If no report container found, extract body content
-                    body_start = html_str.find('<body>')
-                    body_end = html_str.find('</body>')
-                    if body_start != -1 and body_end != -1:
-                        return html_str[body_start + 6:body_end]
+                    body_start = html.find(b'<body>')
+                    body_end = html.find(b'</body>', body_start + 6) if body_start != -1 else -1
+                    if body_end != -1:
+                        return html[body_start + 6:body_end].decode('utf-8')
                     else:
-                        return html_str
+                        return html.decode('utf-8')
             
             return "<div class='alert alert-warning'>No content generated</div>"
             
         except Exception as e:
-            print(f"Preview generation error: {e}")
+            logger.warning('Preview generation error: %s', e)
             return f"<div class='alert alert-danger'>Preview generation error: {str(e)}</div>"
     
     
     def get_sample_reports(self):
         """Get list of available sample reports."""
-        return [
-            {'id': 'customer_orders', 'name': 'Customer Orders Report'},
-            {'id': 'customer_summary', 'name': 'Customer Summary Report'},
-            {'id': 'orders_by_date', 'name': 'Orders by Date Report'}
-        ]
+        return SAMPLE_REPORTS
     
     def generate_sample_jrxml(self, report_id='customer_orders'):
         """Generate a sample JRXML file for the sample database."""
-        if report_id == 'customer_summary':
-            return self._generate_customer_summary_jrxml()
-        elif report_id == 'orders_by_date':
-            return self._generate_orders_by_date_jrxml()
-        else:
-            return self._generate_customer_orders_jrxml()
+        return _SAMPLE_JRXML.get(report_id, _CUSTOMER_ORDERS_JRXML)
     
     def _generate_customer_orders_jrxml(self):
-        """Generate the Customer Orders Report JRXML."""
-        sample_jrxml = '''<?xml version="1.0" encoding="UTF-8"?>
+        """Return the Customer Orders Report JRXML."""
+        return _CUSTOMER_ORDERS_JRXML
+    
+    def _generate_customer_summary_jrxml(self):
+        """Return the Customer Summary Report JRXML."""
+        return _CUSTOMER_SUMMARY_JRXML
+    
+    def _generate_orders_by_date_jrxml(self):
+        """Return the Orders by Date Report JRXML."""
+        return _ORDERS_BY_DATE_JRXML
+    
+    def get_all_connections(self):
+        """Get all active database connections as rows of the CONNECTION_COLUMNS values."""
+        return _active_connections_query(db.session()).all()
+    
+    def get_connection_string(self, connection_id):
+        """Get the connection string of a saved connection, or None if it does not exist."""
+        now = time.monotonic()
+        cached = self._connection_strings.get(connection_id)
+        if cached is not None and cached[0] > now:
+            return cached[1]
+        
+        rows = fast_scalar_col(
+            'SELECT connection_string FROM database_connections WHERE id = ?',
+            (connection_id,)
+        )
+        if not rows:
+            return None
+        # Only hits are cached, so made-up ids can't grow the cache
+        self._connection_strings[connection_id] = (now + CONNECTION_STRING_TTL, rows[0])
+        return rows[0]
+    
+    def delete_connection(self, connection_id):
+        """Delete a database connection."""
+        # Primary key lookup: served from the session's identity map when already loaded
+        connection = db.session.get(DatabaseConnection, connection_id)
+        if connection:
+            connection.is_active = False
+            db.session.commit()
+            self._connection_strings.pop(connection_id, None)
+            _dispose_engine(connection.connection_string)
+            return True
+        return False
+    
+    def test_connection(self, connection_string):
+        """Test if database connection is valid."""
+        try:
+            engine = _get_engine(connection_string)
+            with engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+            return True, "Connection successful"
+        except Exception as e:
+            return False, str(e)
+
+
+# Sample report JRXML served by JasperManager.generate_sample_jrxml
+_CUSTOMER_ORDERS_JRXML = '''<?xml version="1.0" encoding="UTF-8"?>
 <jasperReport xmlns="http://jasperreports.sourceforge.net/jasperreports"
               xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance"
               xsi:schemaLocation="http://jasperreports.sourceforge.net/jasperreports
@@ -342,11 +508,9 @@ class JasperManager:
     </pageFooter>
 
 </jasperReport>'''
-        return sample_jrxml
-    
-    def _generate_customer_summary_jrxml(self):
-        """Generate the Customer Summary Report JRXML."""
-        return '''<?xml version="1.0" encoding="UTF-8"?>
+
+
+_CUSTOMER_SUMMARY_JRXML = '''<?xml version="1.0" encoding="UTF-8"?>
 <jasperReport xmlns="http://jasperreports.sourceforge.net/jasperreports"
               xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance"
               xsi:schemaLocation="http://jasperreports.sourceforge.net/jasperreports
@@ -472,9 +636,8 @@ class JasperManager:
 
 </jasperReport>'''
 
-    def _generate_orders_by_date_jrxml(self):
-        """Generate the Orders by Date Report JRXML."""
-        return '''<?xml version="1.0" encoding="UTF-8"?>
+
+_ORDERS_BY_DATE_JRXML = '''<?xml version="1.0" encoding="UTF-8"?>
 <jasperReport xmlns="http://jasperreports.sourceforge.net/jasperreports"
               xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance"
               xsi:schemaLocation="http://jasperreports.sourceforge.net/jasperreports
@@ -616,26 +779,16 @@ class JasperManager:
     </pageFooter>
 
 </jasperReport>'''
-    
-    def get_all_connections(self):
-        """Get all database connections."""
-        return DatabaseConnection.query.filter_by(is_active=True).all()
-    
-    def delete_connection(self, connection_id):
-        """Delete a database connection."""
-        connection = DatabaseConnection.query.get(connection_id)
-        if connection:
-            connection.is_active = False
-            db.session.commit()
-            return True
-        return False
-    
-    def test_connection(self, connection_string):
-        """Test if database connection is valid."""
-        try:
-            engine = create_engine(connection_string)
-            with engine.connect() as conn:
-                conn.execute(text("SELECT 1"))
-            return True, "Connection successful"
-        except Exception as e:
-            return False, str(e)
+
+# The sample catalog is fixed, so every request shares this one tuple
+SAMPLE_REPORTS = (
+    {'id': 'customer_orders', 'name': 'Customer Orders Report'},
+    {'id': 'customer_summary', 'name': 'Customer Summary Report'},
+    {'id': 'orders_by_date', 'name': 'Orders by Date Report'},
+)
+
+_SAMPLE_JRXML = {
+    'customer_orders': _CUSTOMER_ORDERS_JRXML,
+    'customer_summary': _CUSTOMER_SUMMARY_JRXML,
+    'orders_by_date': _ORDERS_BY_DATE_JRXML,
+}
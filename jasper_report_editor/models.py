@@ -1,5 +1,11 @@
 from config import db
 
+# Columns exposed by to_dict() and the connection listings; the password is never included
+CONNECTION_COLUMNS = (
+    'id', 'name', 'database_type', 'host', 'port', 'database_name',
+    'username', 'connection_string', 'is_active', 'created_at'
+)
+
 class DatabaseConnection(db.Model):
     __tablename__ = 'database_connections'
     
@@ -19,15 +25,4 @@ class DatabaseConnection(db.Model):
         return f'<DatabaseConnection {self.name}>'
     
     def to_dict(self):
-        return {
-            'id': self.id,
-            'name': self.name,
-            'database_type': self.database_type,
-            'host': self.host,
-            'port': self.port,
-            'database_name': self.database_name,
-            'username': self.username,
-            'connection_string': self.connection_string,
-            'is_active': self.is_active,
-            'created_at': self.created_at
-        }
\ No newline at end of file
+        return {column: getattr(self, column) for column in CONNECTION_COLUMNS}
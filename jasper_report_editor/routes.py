@@ -1,82 +1,158 @@
+import logging
 import os
 import base64
-from flask import request, render_template, redirect, url_for, flash, jsonify
+import hashlib
+import re
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, wraps
+from pathlib import Path
+from flask import (current_app, request, render_template, redirect, url_for, flash, jsonify, abort,
+                   send_file, make_response)
+from jinja2 import Environment
+from markupsafe import Markup
+from werkzeug.local import LocalProxy
 from werkzeug.utils import secure_filename
 
 from . import jasper_report_editor_bp
-from .manager import JasperManager
-from .models import DatabaseConnection
-import sys
-import os
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from .fsutil import private_directory
+from .manager import SAMPLE_REPORTS
 from pyjasper_lib_integration import pyjasper_integration
 
-manager = JasperManager()
+logger = logging.getLogger(__name__)
 
+# The JasperManager of the current app, set up by jasper_report_editor.init_app
+manager = LocalProxy(lambda: current_app.extensions['jasper_manager'])
 
-@jasper_report_editor_bp.route('/', methods=['GET', 'POST'])
-def editor():
-    print("=== Editor route accessed ===")
-    jrxml_text = ''
-    try:
-        connections = manager.get_all_connections()
-        sample_reports = manager.get_sample_reports()
-        print(f"Loaded {len(connections)} connections and {len(sample_reports)} sample reports")
-    except Exception as e:
-        connections = []
-        sample_reports = []
-        print(f'Error loading data: {str(e)}')
+# Report ids accepted by load_sample_report
+_VALID_REPORTS = frozenset(report['id'] for report in SAMPLE_REPORTS)
+
+# Writes the uploaded JRXML copies to uploads/ off the request thread
+_upload_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='jrxml-upload')
+
+# Generated PDFs wait in a private directory under the instance folder until the browser
+# fetches them by token. A directory rather than an in-process dict, so the follow-up request
+# may land on any worker.
+PDF_PREVIEW_TTL = 300
+_PDF_TOKEN_RE = re.compile(r'[0-9a-f]{32}')
+# When this worker next removes expired previews (time.monotonic)
+_next_pdf_sweep = 0.0
+
+
+def _pdf_preview_dir():
+    """Directory holding the current app's stored PDFs, set up by init_app."""
+    return current_app.extensions['jasper_pdf_previews']
+
+
+def _sweep_pdf_previews(directory):
+    """Delete stored PDFs older than PDF_PREVIEW_TTL."""
+    cutoff = time.time() - PDF_PREVIEW_TTL
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.unlink(entry.path)
+            except OSError:
+                pass
+
+
+def _stash_pdf(content):
+    """Store generated PDF bytes and return the token that serves them."""
+    global _next_pdf_sweep
+    directory = _pdf_preview_dir()
     
-    if request.method == 'POST':
-        file = request.files.get('jrxml')
-        if file:
-            filename = secure_filename(file.filename)
-            path = os.path.join('uploads', filename)
-            os.makedirs('uploads', exist_ok=True)
-            file.save(path)
-            with open(path) as f:
-                jrxml_text = f.read()
+    # Expired files only need clearing about once per TTL, not on every store
+    now = time.monotonic()
+    if now >= _next_pdf_sweep:
+        _next_pdf_sweep = now + PDF_PREVIEW_TTL
+        _sweep_pdf_previews(directory)
     
+    token = uuid.uuid4().hex
+    (directory / f'{token}.pdf').write_bytes(content)
+    return token
+
+
+def _etag_matches(etag):
+    """Whether If-None-Match names etag, including Flask-Compress's "<etag>:<algorithm>" form."""
+    if_none_match = request.if_none_match
+    return if_none_match.star_tag or any(
+        tag.partition(':')[0] == etag for tag in if_none_match.as_set(include_weak=True)
+    )
+
+
+def _http_cached(max_age=None):
+    """Tag 200 responses with an ETag of their body and answer matching requests with 304.
+    
+    Browsers may reuse the response for max_age seconds; without it they revalidate every time.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+            
+            etag = hashlib.blake2s(response.get_data(), digest_size=8).hexdigest()
+            if _etag_matches(etag):
+                response = current_app.response_class(status=304)
+            response.set_etag(etag)
+            if max_age is None:
+                response.cache_control.no_cache = True
+            else:
+                response.cache_control.max_age = max_age
+            return response
+        return wrapper
+    return decorator
+
+
+def _connection_string_for(connection_id):
+    """Connection string for a connection id taken from a form; None if it is missing or invalid."""
+    if not connection_id:
+        return None
     try:
-        print("Attempting to render template...")
-        return render_template('jasper_report_editor/editor.html',
-                               jrxml_text=jrxml_text,
-                               connections=connections,
-                               sample_reports=sample_reports)
-    except Exception as e:
-        print(f"Template rendering failed: {e}")
-        # Return a simplified HTML page as fallback
-        sample_reports_html = ""
-        for report in sample_reports:
-            sample_reports_html += f'<li><a href="/editor/load_sample_report/{report["id"]}">{report["name"]}</a></li>'
-        
-        return f"""
+        return manager.get_connection_string(int(connection_id))
+    except (ValueError, TypeError):
+        return None
+
+
+def _save_upload(path, data):
+    """Keep a copy of an uploaded JRXML file under uploads/."""
+    try:
+        os.makedirs('uploads', exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+    except OSError as e:
+        logger.warning('Failed to save upload %s: %s', path, e)
+
+# Pages served when the editor template itself fails to render
+EDITOR_FALLBACK_SRC = """
         <!DOCTYPE html>
         <html>
         <head>
             <title>Jasper Report Editor</title>
             <style>
-                body {{ font-family: Arial, sans-serif; margin: 20px; }}
-                .container {{ max-width: 1200px; margin: 0 auto; }}
-                textarea {{ width: 100%; height: 400px; font-family: monospace; }}
-                .preview {{ border: 1px solid #ccc; min-height: 300px; padding: 10px; }}
+                body { font-family: Arial, sans-serif; margin: 20px; }
+                .container { max-width: 1200px; margin: 0 auto; }
+                textarea { width: 100%; height: 400px; font-family: monospace; }
+                .preview { border: 1px solid #ccc; min-height: 300px; padding: 10px; }
             </style>
         </head>
         <body>
             <div class="container">
                 <h1>Jasper Report Editor (Simplified)</h1>
-                <p><strong>Template Error:</strong> {e}</p>
+                <p><strong>Template Error:</strong> {{ error }}</p>
                 
                 <h3>Sample Reports:</h3>
-                <ul>{sample_reports_html}</ul>
+                <ul>{{ sample_report_items }}</ul>
                 
                 <h3>JRXML Editor:</h3>
                 <form method="post" action="/editor/preview">
-                    <textarea name="jrxml_content" placeholder="Enter JRXML content here...">{jrxml_text}</textarea>
+                    <textarea name="jrxml_content" placeholder="Enter JRXML content here...">{{ jrxml_text }}</textarea>
                     <br><br>
                     <select name="connection_id">
                         <option value="">Select Database Connection</option>
-                        {"".join([f'<option value="{conn.id}">{conn.name}</option>' for conn in connections])}
+                        {{ connection_options }}
                     </select>
                     <button type="submit">Preview Report</button>
                 </form>
@@ -88,6 +164,80 @@ def editor():
         </html>
         """
 
+SAMPLE_FALLBACK_SRC = """
+            <html>
+            <head><title>Sample Report: {{ report_id }}</title></head>
+            <body>
+                <h1>Sample Report Loaded: {{ report_id }}</h1>
+                <p><a href="/editor/">Back to Editor</a></p>
+                <h3>JRXML Content:</h3>
+                <pre style="background: #f5f5f5; padding: 10px; overflow: auto;">{{ jrxml }}</pre>
+            </body>
+            </html>
+            """
+
+# List fragments of the editor fallback page, rendered from (id, name) pairs
+FALLBACK_SAMPLE_ITEMS_SRC = (
+    '{% for id, name in sample_reports %}'
+    '<li><a href="/editor/load_sample_report/{{ id }}">{{ name }}</a></li>'
+    '{% endfor %}'
+)
+FALLBACK_CONNECTION_OPTIONS_SRC = (
+    '{% for id, name in connections %}<option value="{{ id }}">{{ name }}</option>{% endfor %}'
+)
+
+# Compiled once at import; values are HTML-escaped, so JRXML shows as text
+_FALLBACK_ENV = Environment(autoescape=True)
+_EDITOR_FALLBACK_TMPL = _FALLBACK_ENV.from_string(EDITOR_FALLBACK_SRC)
+_SAMPLE_FALLBACK_TMPL = _FALLBACK_ENV.from_string(SAMPLE_FALLBACK_SRC)
+_FALLBACK_SAMPLE_ITEMS_TMPL = _FALLBACK_ENV.from_string(FALLBACK_SAMPLE_ITEMS_SRC)
+_FALLBACK_CONNECTION_OPTIONS_TMPL = _FALLBACK_ENV.from_string(FALLBACK_CONNECTION_OPTIONS_SRC)
+
+
+@lru_cache(maxsize=16)
+def _fallback_lists(connections, sample_reports):
+    """Rendered (connection options, sample report items); the key includes names, so edits miss."""
+    return (Markup(_FALLBACK_CONNECTION_OPTIONS_TMPL.render(connections=connections)),
+            Markup(_FALLBACK_SAMPLE_ITEMS_TMPL.render(sample_reports=sample_reports)))
+
+
+@jasper_report_editor_bp.route('/', methods=['GET', 'POST'])
+def editor():
+    jrxml_text = ''
+    try:
+        connections = manager.get_all_connections()
+        sample_reports = manager.get_sample_reports()
+        logger.debug('Loaded %d connections and %d sample reports', len(connections), len(sample_reports))
+    except Exception as e:
+        connections = []
+        sample_reports = []
+        logger.warning('Error loading editor data: %s', e)
+    
+    if request.method == 'POST':
+        file = request.files.get('jrxml')
+        if file:
+            filename = secure_filename(file.filename)
+            data = file.read()
+            # The editor works from the bytes in hand; the copy on disk is not read back
+            if filename:
+                _upload_writer.submit(_save_upload, os.path.join('uploads', filename), data)
+            jrxml_text = data.decode('utf-8', errors='replace')
+    
+    try:
+        return render_template('jasper_report_editor/editor.html',
+                               jrxml_text=jrxml_text,
+                               connections=connections,
+                               sample_reports=sample_reports)
+    except Exception as e:
+        logger.warning('Editor template rendering failed: %s', e)
+        # Return a simplified HTML page as fallback
+        connection_options, sample_report_items = _fallback_lists(
+            tuple((conn.id, conn.name) for conn in connections),
+            tuple((report['id'], report['name']) for report in sample_reports)
+        )
+        return _EDITOR_FALLBACK_TMPL.render(error=e, sample_report_items=sample_report_items,
+                                            connection_options=connection_options, jrxml_text=jrxml_text)
+
 
 @jasper_report_editor_bp.route('/save', methods=['POST'])
 def save_jrxml():
@@ -110,55 +260,31 @@ def test_route(report_id):
     return f"Test route working for report_id: {report_id}"
 
 @jasper_report_editor_bp.route('/load_sample_report/<report_id>')
+@_http_cached()
 def load_sample_report(report_id):
-    print(f"=== Loading sample report: {report_id} ===")
-    
     # Validate report_id
-    valid_reports = ['customer_orders', 'customer_summary', 'orders_by_date']
-    if report_id not in valid_reports:
-        print(f"Invalid report_id: {report_id}")
+    if report_id not in _VALID_REPORTS:
+        logger.debug('Invalid sample report id: %s', report_id)
         return f"<h1>Error</h1><p>Invalid report ID: {report_id}</p><p><a href='/editor/'>Back to Editor</a></p>"
     
     try:
-        print(f"Generating JRXML for: {report_id}")
         sample_jrxml = manager.generate_sample_jrxml(report_id)
-        print(f"Generated JRXML length: {len(sample_jrxml) if sample_jrxml else 0}")
-        
-        print("Loading connections...")
         connections = manager.get_all_connections()
-        print(f"Found {len(connections)} connections")
-        
-        print("Getting sample reports list...")
         sample_reports = manager.get_sample_reports()
-        print(f"Found {len(sample_reports)} sample reports")
+        logger.debug('Loading sample report %s with %d connections', report_id, len(connections))
         
-        print("Rendering template...")
         try:
-            result = render_template('jasper_report_editor/editor.html',
+            return render_template('jasper_report_editor/editor.html',
                                    jrxml_text=sample_jrxml,
                                    connections=connections,
                                    sample_reports=sample_reports)
-            print(f"Template rendered successfully, length: {len(result)}")
-            return result
         except Exception as template_error:
-            print(f"Template rendering error: {template_error}")
+            logger.warning('Sample report template rendering failed: %s', template_error)
             # Return a simple HTML page with the JRXML content
-            return f"""
-            <html>
-            <head><title>Sample Report: {report_id}</title></head>
-            <body>
-                <h1>Sample Report Loaded: {report_id}</h1>
-                <p><a href="/editor/">Back to Editor</a></p>
-                <h3>JRXML Content:</h3>
-                <pre style="background: #f5f5f5; padding: 10px; overflow: auto;">{sample_jrxml}</pre>
-            </body>
-            </html>
-            """
+            return _SAMPLE_FALLBACK_TMPL.render(report_id=report_id, jrxml=sample_jrxml)
         
     except Exception as e:
-        print(f"ERROR loading sample report {report_id}: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception('Error loading sample report %s', report_id)
         return f"<h1>Error</h1><p>Error loading sample report: {str(e)}</p><p><a href='/editor/'>Back to Editor</a></p>"
 
 
@@ -181,18 +307,10 @@ def generate_with_pyjasper():
         connection_id = request.form.get('connection')
         output_format = request.form.get('format', 'html').lower()
         
-        if not jrxml_content.strip():
+        if not jrxml_content or jrxml_content.isspace():
             return jsonify({'error': 'No JRXML content provided'}), 400
         
-        # Get connection string if connection is selected
-        connection_string = None
-        if connection_id:
-            try:
-                connection = DatabaseConnection.query.get(int(connection_id))
-                if connection:
-                    connection_string = connection.connection_string
-            except (ValueError, TypeError):
-                pass
+        connection_string = _connection_string_for(connection_id)
         
         # Generate report using PyJasper
         content, error = pyjasper_integration.generate_report(
@@ -204,12 +322,16 @@ def generate_with_pyjasper():
         if error:
             return jsonify({'error': error}), 500
         
-        # Return content as base64 for HTML or direct bytes for PDF
+        # PDFs are served from their own URL; base64 in the JSON only when asked for
         if output_format == 'pdf':
-            return jsonify({
-                'content': base64.b64encode(content).decode('utf-8'),
+            token = _stash_pdf(content)
+            result = {
+                'pdf_url': url_for('JasperReportEditor.preview_pdf', token=token),
                 'type': 'pdf'
-            })
+            }
+            if request.form.get('encoding') == 'base64':
+                result['content'] = base64.b64encode(content).decode('utf-8')
+            return jsonify(result)
         else:
             return jsonify({
                 'content': content.decode('utf-8'),
@@ -226,7 +348,7 @@ def validate_jrxml():
     try:
         jrxml_content = request.form.get('jrxml_text', '')
         
-        if not jrxml_content.strip():
+        if not jrxml_content or jrxml_content.isspace():
             return jsonify({'error': 'No JRXML content provided'}), 400
         
         validation = pyjasper_integration.validate_jrxml(jrxml_content)
@@ -244,18 +366,10 @@ def preview_data():
         connection_id = request.form.get('connection')
         limit = int(request.form.get('limit', 10))
         
-        if not jrxml_content.strip():
+        if not jrxml_content or jrxml_content.isspace():
             return jsonify({'error': 'No JRXML content provided'}), 400
         
-        # Get connection string
-        connection_string = None
-        if connection_id:
-            try:
-                connection = DatabaseConnection.query.get(int(connection_id))
-                if connection:
-                    connection_string = connection.connection_string
-            except (ValueError, TypeError):
-                pass
+        connection_string = _connection_string_for(connection_id)
         
         if not connection_string:
             return jsonify({'error': 'No database connection selected'}), 400
@@ -286,15 +400,7 @@ def generate_sample_jrxml():
         if not table_name:
             return jsonify({'error': 'No table name provided'}), 400
         
-        # Get connection string
-        connection_string = None
-        if connection_id:
-            try:
-                connection = DatabaseConnection.query.get(int(connection_id))
-                if connection:
-                    connection_string = connection.connection_string
-            except (ValueError, TypeError):
-                pass
+        connection_string = _connection_string_for(connection_id)
         
         if not connection_string:
             return jsonify({'error': 'No database connection selected'}), 400
@@ -315,6 +421,7 @@ def generate_sample_jrxml():
 
 
 @jasper_report_editor_bp.route('/library_status')
+@_http_cached(max_age=30)
 def library_status():
     """Get PyJasper library status."""
     try:
@@ -324,6 +431,7 @@ def library_status():
         return jsonify({'error': f'Status check failed: {str(e)}'}), 500
 
 @jasper_report_editor_bp.route('/connections')
+@_http_cached()
 def connections():
     try:
         connections = manager.get_all_connections()
@@ -373,9 +481,9 @@ def delete_connection(connection_id):
 
 @jasper_report_editor_bp.route('/connections/test/<int:connection_id>')
 def test_connection(connection_id):
-    connection = DatabaseConnection.query.get(connection_id)
-    if connection:
-        success, message = manager.test_connection(connection.connection_string)
+    connection_string = manager.get_connection_string(connection_id)
+    if connection_string:
+        success, message = manager.test_connection(connection_string)
         return jsonify({'success': success, 'message': message})
     return jsonify({'success': False, 'message': 'Connection not found'})
 
@@ -391,15 +499,7 @@ def preview_report():
             'message': 'No JRXML content provided'
         })
     
-    # Get connection details
-    connection_string = None
-    if connection_id:
-        try:
-            connection = DatabaseConnection.query.get(int(connection_id))
-            if connection:
-                connection_string = connection.connection_string
-        except (ValueError, TypeError):
-            pass
+    connection_string = _connection_string_for(connection_id)
     
     try:
         # Use PyJasper library for report generation
@@ -424,17 +524,17 @@ def preview_report():
                 'message': f'Report preview generated in {output_format.upper()} format'
             })
         elif output_format == 'pdf':
-            # For PDF, encode as base64 for embedding
-            pdf_base64 = base64.b64encode(content).decode('utf-8')
+            # The PDF is embedded by URL instead of inlined twice as a base64 data URI
+            pdf_url = url_for('JasperReportEditor.preview_pdf', token=_stash_pdf(content))
             pdf_embed_html = f'''
                 <div style="height: 100%; min-height: 500px;">
-                    <embed src="data:application/pdf;base64,{pdf_base64}" 
+                    <embed src="{pdf_url}" 
                            type="application/pdf" 
                            width="100%" 
                            height="600px" />
                 </div>
                 <div class="mt-2 text-center">
-                    <a href="data:application/pdf;base64,{pdf_base64}" 
+                    <a href="{pdf_url}" 
                        download="report.pdf" 
                        class="btn btn-sm btn-primary">
                         <i class="fas fa-download"></i> Download PDF
@@ -459,3 +559,11 @@ def preview_report():
             'success': False,
             'message': f'Error generating preview: {str(e)}'
         })
+
+@jasper_report_editor_bp.route('/preview/pdf/<token>')
+def preview_pdf(token):
+    """Serve a PDF stored by a recent preview or generate request."""
+    path = _pdf_preview_dir() / f'{token}.pdf'
+    if not _PDF_TOKEN_RE.fullmatch(token) or not path.is_file():
+        abort(404)
+    return send_file(path, mimetype='application/pdf', download_name='report.pdf')
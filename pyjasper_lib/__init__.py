@@ -8,12 +8,13 @@ This library provides full JasperReports compatibility including:
 - Parameter handling and expressions
 - Group processing and aggregations
 - Charts, images, and advanced formatting
+
+Public classes are imported lazily from their submodules on first access,
+so ``import pyjasper_lib`` stays cheap for callers that only need a few of them.
 """
 
-from .core import JasperReport
-from .renderers import HTMLRenderer, PDFRenderer
-from .parsers import JRXMLParser
-from .database import DatabaseEngine
+import importlib
+
 from .exceptions import (
     JasperError,
     JRXMLParseError,
@@ -24,8 +25,19 @@ from .exceptions import (
 __version__ = "1.0.0"
 __author__ = "PyJasper Team"
 
+# Public name -> submodule that defines it
+_LAZY_IMPORTS = {
+    'JasperReport': '.core',
+    'ReportBuilder': '.core',
+    'HTMLRenderer': '.renderers',
+    'PDFRenderer': '.renderers',
+    'JRXMLParser': '.parsers',
+    'DatabaseEngine': '.database',
+}
+
 __all__ = [
     'JasperReport',
+    'ReportBuilder',
     'HTMLRenderer', 
     'PDFRenderer',
     'JRXMLParser',
@@ -34,4 +46,19 @@ __all__ = [
     'JRXMLParseError', 
     'DatabaseError',
     'RenderError'
-]
\ No newline at end of file
+]
+
+
+def __getattr__(name):
+    """Import public classes from their submodule on first access."""
+    module_name = _LAZY_IMPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
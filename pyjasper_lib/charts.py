@@ -3,11 +3,126 @@ Chart and image support for PyJasper reports.
 """
 
 import base64
+import hashlib
+import pickle
+from datetime import datetime
+from functools import lru_cache, partial
 from io import BytesIO
-from typing import Dict, List, Any, Optional, Tuple
+from operator import contains, ge, gt, itemgetter, le, lt
+from typing import Callable, Dict, List, Any, Optional, Tuple
 import os
+from .cache import LRUCache
 from .exceptions import RenderError
 
+# Number of rendered charts kept per ChartRenderer; repeated charts in a report render once
+CHART_CACHE_SIZE = 32
+
+# Default resolution of rendered charts; a chart's config may set 'dpi' to trade quality for speed
+CHART_DPI = 150
+
+# Bytes read per step when base64-encoding an image file; a multiple of 3, so only the
+# final chunk can need padding and the encoded chunks concatenate cleanly
+IMAGE_READ_CHUNK = 57 * 1024
+
+# Number of image data URIs kept by ImageHandler.load_image; repeated logos skip disk and encoding
+IMAGE_CACHE_SIZE = 128
+# Files larger than this are encoded on every load instead of cached, which caps the cache at
+# roughly IMAGE_CACHE_SIZE * 4/3 * IMAGE_CACHE_MAX_BYTES of encoded text (about 44 MB)
+IMAGE_CACHE_MAX_BYTES = 256 * 1024
+
+# Inputs at least this large go through libvips in ImageHandler.resize_image when pyvips is
+# installed; it shrinks on load instead of decoding the full image first
+VIPS_RESIZE_MIN_BYTES = 1024 * 1024
+
+# Image file extension -> data URI subtype; anything else is sent as PNG
+_IMAGE_FORMATS = {
+    '.jpg': 'jpeg',
+    '.jpeg': 'jpeg',
+    '.png': 'png',
+    '.gif': 'gif',
+    '.bmp': 'bmp',
+    '.webp': 'webp'
+}
+
+
+@lru_cache(maxsize=None)
+def _load_pyplot():
+    """Import pyplot on the Agg backend once per process; None if matplotlib is not installed."""
+    try:
+        import matplotlib
+        matplotlib.use('Agg')  # Use non-interactive backend
+        import matplotlib.pyplot as plt
+    except ImportError:
+        return None
+    return plt
+
+
+@lru_cache(maxsize=None)
+def _load_pyvips():
+    """Import pyvips once per process; None if it or the libvips library is not installed."""
+    try:
+        import pyvips
+    except (ImportError, OSError):
+        return None
+    return pyvips
+
+
+def _encode_image(image_path: str) -> str:
+    """Base64 data URI of an image file."""
+    data_uri = bytearray(f"data:image/{ImageHandler._get_image_format(image_path)};base64,".encode('ascii'))
+    
+    # Encode chunk by chunk so the raw file is never held in memory as a whole
+    with open(image_path, 'rb') as image_file:
+        for chunk in iter(partial(image_file.read, IMAGE_READ_CHUNK), b''):
+            data_uri += base64.b64encode(chunk)
+    
+    return data_uri.decode('ascii')
+
+
+@lru_cache(maxsize=IMAGE_CACHE_SIZE)
+def _image_data_uri(image_path: str, mtime_ns: int, size: int) -> str:
+    """Cached _encode_image; the stat values only key the cache, so edits miss."""
+    return _encode_image(image_path)
+
+
+# Input formats FormattingUtils.format_date tries, keyed by a separator each requires literally,
+# so a string is only parsed against formats it can match; order within a key is preserved
+_SLASH_DATE_FORMATS = ("%m/%d/%Y", "%d/%m/%Y")
+_DATETIME_FORMATS = ("%Y-%m-%d %H:%M:%S",)
+_DASH_DATE_FORMATS = ("%Y-%m-%d",)
+
+
+# Conditional formatting: numeric comparisons of (value, threshold) and text matches of
+# (lowercased value, lowercased target), by condition type
+_NUMERIC_CONDITIONS = {
+    'greater_than': gt,
+    'less_than': lt,
+    'greater_equal': ge,
+    'less_equal': le
+}
+_TEXT_CONDITIONS = {
+    'contains': contains,
+    'starts_with': str.startswith,
+    'ends_with': str.endswith
+}
+
+
+def _column(data: List[Dict[str, Any]], field: str, default: Any) -> List[Any]:
+    """Values of one field across the rows, with default for rows that lack it."""
+    try:
+        # Common case: every row has the field, so a C-level itemgetter map does the whole pass
+        return list(map(itemgetter(field), data))
+    except KeyError:
+        return [row.get(field, default) for row in data]
+
+
+def _float_column(data: List[Dict[str, Any]], field: str):
+    """Numeric values of one field as a float64 array, which matplotlib takes without re-sanitizing."""
+    import numpy  # matplotlib dependency, so present whenever a chart builder runs
+    # float() per value keeps Decimal/str handling and errors as before; fromiter fills the
+    # preallocated array directly instead of going through an intermediate list
+    return numpy.fromiter(map(float, _column(data, field, 0)), dtype=numpy.float64, count=len(data))
+
 
 class ChartRenderer:
     """Handles chart generation for reports."""
@@ -20,15 +135,42 @@ class ChartRenderer:
             'area': self._create_area_chart,
             'column': self._create_column_chart
         }
+        # Rendered charts keyed by content hash
+        self._cache = LRUCache(CHART_CACHE_SIZE)
     
     def create_chart(self, chart_type: str, data: List[Dict[str, Any]], 
                     config: Dict[str, Any]) -> str:
         """Create a chart and return it as base64 encoded string."""
+        key = self._cache_key(chart_type, data, config)
+        if key is not None:
+            cached = self._cache.get(key)
+            if cached is not None:
+                return cached
+        
+        chart = self._render_chart(chart_type, data, config)
+        
+        if key is not None:
+            self._cache.put(key, chart)
+        return chart
+    
+    @staticmethod
+    def _cache_key(chart_type: str, data: List[Dict[str, Any]], config: Dict[str, Any]) -> Optional[bytes]:
+        """Digest of everything a chart depends on; None if the inputs cannot be pickled."""
+        try:
+            payload = pickle.dumps((chart_type, data, config), protocol=5)
+        except Exception:
+            return None
+        return hashlib.blake2b(payload, digest_size=16).digest()
+    
+    def _render_chart(self, chart_type: str, data: List[Dict[str, Any]], 
+                      config: Dict[str, Any]) -> str:
+        """Render a chart to a PNG data URI, or to HTML when matplotlib is missing."""
+        plt = _load_pyplot()
+        if plt is None:
+            # Fallback: create a simple HTML representation
+            return self._create_html_chart(chart_type, data, config)
+        
         try:
-            import matplotlib.pyplot as plt
-            import matplotlib
-            matplotlib.use('Agg')  # Use non-interactive backend
-            
             chart_func = self.chart_types.get(chart_type.lower())
             if not chart_func:
                 raise RenderError(f"Unsupported chart type: {chart_type}")
@@ -38,17 +180,15 @@ class ChartRenderer:
             
             # Save to base64
             buffer = BytesIO()
-            plt.savefig(buffer, format='png', dpi=150, bbox_inches='tight')
-            buffer.seek(0)
+            fig.savefig(buffer, format='png', dpi=config.get('dpi', CHART_DPI), bbox_inches='tight')
             
-            image_base64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
+            # Encode straight from the buffer's memory; base64 output is pure ASCII
+            with buffer.getbuffer() as png:
+                image_base64 = base64.b64encode(png).decode('ascii')
             plt.close(fig)
             
             return f"data:image/png;base64,{image_base64}"
             
-        except ImportError:
-            # Fallback: create a simple HTML representation
-            return self._create_html_chart(chart_type, data, config)
         except Exception as e:
             raise RenderError(f"Chart creation failed: {e}")
     
@@ -57,8 +197,8 @@ class ChartRenderer:
         x_field = config.get('x_field', 'category')
         y_field = config.get('y_field', 'value')
         
-        categories = [row.get(x_field, '') for row in data]
-        values = [float(row.get(y_field, 0)) for row in data]
+        categories = _column(data, x_field, '')
+        values = _float_column(data, y_field)
         
         ax.bar(categories, values)
         ax.set_title(config.get('title', 'Bar Chart'))
@@ -74,8 +214,8 @@ class ChartRenderer:
         x_field = config.get('x_field', 'category')
         y_field = config.get('y_field', 'value')
         
-        x_values = [row.get(x_field, '') for row in data]
-        y_values = [float(row.get(y_field, 0)) for row in data]
+        x_values = _column(data, x_field, '')
+        y_values = _float_column(data, y_field)
         
         ax.plot(x_values, y_values, marker='o')
         ax.set_title(config.get('title', 'Line Chart'))
@@ -90,8 +230,8 @@ class ChartRenderer:
         label_field = config.get('label_field', 'category')
         value_field = config.get('value_field', 'value')
         
-        labels = [row.get(label_field, '') for row in data]
-        values = [float(row.get(value_field, 0)) for row in data]
+        labels = _column(data, label_field, '')
+        values = _float_column(data, value_field)
         
         ax.pie(values, labels=labels, autopct='%1.1f%%', startangle=90)
         ax.set_title(config.get('title', 'Pie Chart'))
@@ -102,8 +242,8 @@ class ChartRenderer:
         y_field = config.get('y_field', 'value')
         
         x_values = range(len(data))
-        y_values = [float(row.get(y_field, 0)) for row in data]
-        x_labels = [row.get(x_field, '') for row in data]
+        y_values = _float_column(data, y_field)
+        x_labels = _column(data, x_field, '')
         
         ax.fill_between(x_values, y_values, alpha=0.7)
         ax.set_title(config.get('title', 'Area Chart'))
@@ -149,17 +289,14 @@ class ImageHandler:
     def load_image(image_path: str) -> str:
         """Load an image and return it as base64 encoded string."""
         try:
-            if not os.path.exists(image_path):
+            try:
+                stat = os.stat(image_path)
+            except FileNotFoundError:
                 raise FileNotFoundError(f"Image not found: {image_path}")
             
-            with open(image_path, 'rb') as image_file:
-                image_data = image_file.read()
-            
-            # Determine image format
-            image_format = ImageHandler._get_image_format(image_path)
-            image_base64 = base64.b64encode(image_data).decode('utf-8')
-            
-            return f"data:image/{image_format};base64,{image_base64}"
+            if stat.st_size > IMAGE_CACHE_MAX_BYTES:
+                return _encode_image(image_path)
+            return _image_data_uri(image_path, stat.st_mtime_ns, stat.st_size)
             
         except Exception as e:
             raise RenderError(f"Failed to load image: {e}")
@@ -167,20 +304,20 @@ class ImageHandler:
     @staticmethod
     def _get_image_format(image_path: str) -> str:
         """Determine image format from file extension."""
-        ext = os.path.splitext(image_path)[1].lower()
-        format_map = {
-            '.jpg': 'jpeg',
-            '.jpeg': 'jpeg',
-            '.png': 'png',
-            '.gif': 'gif',
-            '.bmp': 'bmp',
-            '.webp': 'webp'
-        }
-        return format_map.get(ext, 'png')
+        return _IMAGE_FORMATS.get(os.path.splitext(image_path)[1].lower(), 'png')
     
     @staticmethod
     def resize_image(image_data: bytes, max_width: int, max_height: int) -> bytes:
         """Resize an image while maintaining aspect ratio."""
+        pyvips = _load_pyvips()
+        if pyvips is not None and len(image_data) >= VIPS_RESIZE_MIN_BYTES:
+            try:
+                # size='down' never enlarges, like PIL's thumbnail
+                thumbnail = pyvips.Image.thumbnail_buffer(image_data, max_width, height=max_height, size='down')
+                return thumbnail.write_to_buffer('.png')
+            except pyvips.Error as e:
+                raise RenderError(f"Image resize failed: {e}")
+        
         try:
             from PIL import Image
             
@@ -229,9 +366,9 @@ class ImageHandler:
             # Convert to base64
             output = BytesIO()
             img.save(output, format='PNG')
-            output.seek(0)
             
-            image_base64 = base64.b64encode(output.getvalue()).decode('utf-8')
+            with output.getbuffer() as png:
+                image_base64 = base64.b64encode(png).decode('ascii')
             return f"data:image/png;base64,{image_base64}"
             
         except ImportError:
@@ -280,13 +417,21 @@ class FormattingUtils:
     def format_date(value: Any, format_string: str = "%Y-%m-%d") -> str:
         """Format a date value."""
         try:
-            from datetime import datetime
-            
             if isinstance(value, str):
-                # Try to parse common date formats
-                for fmt in ["%Y-%m-%d", "%m/%d/%Y", "%d/%m/%Y", "%Y-%m-%d %H:%M:%S"]:
+                # Try the common date formats this string can match
+                if '/' in value:
+                    formats = _SLASH_DATE_FORMATS
+                elif ':' in value:
+                    formats = _DATETIME_FORMATS
+                elif '-' in value:
+                    formats = _DASH_DATE_FORMATS
+                else:
+                    formats = ()
+                
+                strptime = datetime.strptime
+                for fmt in formats:
                     try:
-                        date_obj = datetime.strptime(value, fmt)
+                        date_obj = strptime(value, fmt)
                         return date_obj.strftime(format_string)
                     except ValueError:
                         continue
@@ -312,40 +457,51 @@ class FormattingUtils:
     @staticmethod
     def apply_conditional_formatting(value: Any, conditions: List[Dict[str, Any]]) -> Dict[str, str]:
         """Apply conditional formatting based on value conditions."""
-        styles = {}
+        return FormattingUtils.compile_conditions(conditions)(value)
+    
+    @staticmethod
+    def compile_conditions(conditions: List[Dict[str, Any]]) -> Callable[[Any], Dict[str, str]]:
+        """Build apply_conditional_formatting for a fixed rule list, to call once per cell.
         
+        Condition types are resolved and thresholds converted here, once, instead of per value.
+        """
+        rules = []
         for condition in conditions:
-            condition_type = condition.get('type', 'equals')
-            condition_value = condition.get('value')
-            styles_to_apply = condition.get('styles', {})
-            
-            if FormattingUtils._check_condition(value, condition_type, condition_value):
-                styles.update(styles_to_apply)
-                break  # Apply first matching condition
+            predicate = FormattingUtils._compile_condition(condition.get('type', 'equals'), condition.get('value'))
+            if predicate is not None:
+                rules.append((predicate, condition.get('styles', {})))
         
-        return styles
+        def apply(value: Any) -> Dict[str, str]:
+            for predicate, styles in rules:
+                if predicate(value):
+                    return dict(styles)  # Apply first matching condition
+            return {}
+        
+        return apply
     
     @staticmethod
-    def _check_condition(value: Any, condition_type: str, condition_value: Any) -> bool:
-        """Check if a value meets a condition."""
-        try:
-            if condition_type == 'equals':
-                return value == condition_value
-            elif condition_type == 'greater_than':
-                return float(value) > float(condition_value)
-            elif condition_type == 'less_than':
-                return float(value) < float(condition_value)
-            elif condition_type == 'greater_equal':
-                return float(value) >= float(condition_value)
-            elif condition_type == 'less_equal':
-                return float(value) <= float(condition_value)
-            elif condition_type == 'contains':
-                return str(condition_value).lower() in str(value).lower()
-            elif condition_type == 'starts_with':
-                return str(value).lower().startswith(str(condition_value).lower())
-            elif condition_type == 'ends_with':
-                return str(value).lower().endswith(str(condition_value).lower())
-        except (ValueError, TypeError):
-            return False
+    def _compile_condition(condition_type: str, condition_value: Any) -> Optional[Callable[[Any], bool]]:
+        """Predicate for one condition, or None when it can never match."""
+        if condition_type == 'equals':
+            return lambda value: value == condition_value
+        
+        compare = _NUMERIC_CONDITIONS.get(condition_type)
+        if compare is not None:
+            try:
+                threshold = float(condition_value)
+            except (ValueError, TypeError):
+                return None
+            
+            def numeric_predicate(value):
+                try:
+                    return compare(float(value), threshold)
+                except (ValueError, TypeError):
+                    return False
+            return numeric_predicate
+        
+        match = _TEXT_CONDITIONS.get(condition_type)
+        if match is not None:
+            target = str(condition_value).lower()
+            return lambda value: match(str(value).lower(), target)
         
-        return False
\ No newline at end of file
+        return None
\ No newline at end of file
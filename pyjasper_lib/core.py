@@ -2,10 +2,16 @@
 Core JasperReport class that ties everything together.
 """
 
-from typing import Dict, List, Any, Optional, Union
+from typing import Dict, List, Any, Optional, Union, Iterator, BinaryIO
 from pathlib import Path
+from io import BytesIO
 import logging
+import os
+import re
+import uuid
+from contextlib import suppress
 
+from .cache import LRUCache
 from .parsers import JRXMLParser, ReportDefinition, ExpressionEvaluator
 from .database import DatabaseEngine, DataProcessor
 from .renderers import HTMLRenderer, PDFRenderer
@@ -17,27 +23,53 @@ from .exceptions import JasperError, JRXMLParseError, DatabaseError, RenderError
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Field references such as $F{name} inside report expressions
+_FIELD_RE = re.compile(r'\$F\{([^}]+)\}')
+
+# Number of JRXML files whose raw contents are kept by _read_jrxml_source
+JRXML_SOURCE_CACHE_SIZE = 64
+# Raw JRXML file contents keyed by path, reused until the file's mtime changes
+_jrxml_source_cache = LRUCache(JRXML_SOURCE_CACHE_SIZE)
+
+
+def _read_jrxml_source(path: str) -> bytes:
+    """Read a JRXML file, skipping the read when it is unchanged since last time."""
+    key = os.fspath(path)
+    mtime = os.stat(key).st_mtime_ns
+    cached = _jrxml_source_cache.get(key)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    
+    data = Path(key).read_bytes()
+    _jrxml_source_cache.put(key, (mtime, data))
+    return data
+
 
 class JasperReport:
     """Main class for generating JasperReports."""
     
-    def __init__(self, jrxml_path: Optional[str] = None, jrxml_content: Optional[str] = None):
+    def __init__(self, jrxml_path: Optional[str] = None, jrxml_content: Optional[str] = None,
+                 jrxml_bytes: Optional[bytes] = None):
         """
         Initialize JasperReport.
         
         Args:
             jrxml_path: Path to JRXML file
             jrxml_content: JRXML content as string
+            jrxml_bytes: Raw JRXML file contents, e.g. from Path.read_bytes()
         """
-        if not jrxml_path and not jrxml_content:
-            raise JasperError("Either jrxml_path or jrxml_content must be provided")
+        if not jrxml_path and not jrxml_content and not jrxml_bytes:
+            raise JasperError("Either jrxml_path, jrxml_content or jrxml_bytes must be provided")
         
         self.jrxml_path = jrxml_path
         self.jrxml_content = jrxml_content
+        self.jrxml_bytes = jrxml_bytes
         self.report_def: Optional[ReportDefinition] = None
         self.data: List[Dict[str, Any]] = []
         self.parameters: Dict[str, Any] = {}
         self.database_engine: Optional[DatabaseEngine] = None
+        # Shared by add_chart so identical charts in one report are rendered once
+        self.chart_renderer = ChartRenderer()
         
         # Parse JRXML
         self._parse_jrxml()
@@ -49,9 +81,10 @@ class JasperReport:
             
             if self.jrxml_content:
                 content = self.jrxml_content
+            elif self.jrxml_bytes:
+                content = self.jrxml_bytes
             else:
-                with open(self.jrxml_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
+                content = _read_jrxml_source(self.jrxml_path)
             
             self.report_def = parser.parse(content)
             logger.info(f"Successfully parsed JRXML: {self.report_def.name}")
@@ -121,6 +154,15 @@ class JasperReport:
         Returns:
             HTML report as bytes
         """
+        return b''.join(self.iter_html())
+    
+    def iter_html(self) -> Iterator[bytes]:
+        """
+        Generate HTML report incrementally.
+        
+        Yields:
+            UTF-8 encoded chunks of the HTML report
+        """
         if not self.data and self.report_def.query:
             self.execute_query()
         
@@ -130,13 +172,25 @@ class JasperReport:
             renderer.set_parameters(self.parameters)
             
             logger.info("Generating HTML report...")
-            result = renderer.render()
+            yield from renderer.iter_render()
             logger.info("HTML report generated successfully")
-            return result
             
         except Exception as e:
             raise RenderError(f"HTML generation failed: {e}")
     
+    def write_html(self, fileobj: BinaryIO):
+        """
+        Write HTML report to a binary file object chunk by chunk.
+        
+        Chunks written before a render error stay in fileobj; save_report only creates the
+        file once the report is complete.
+        
+        Args:
+            fileobj: Writable binary file object
+        """
+        for chunk in self.iter_html():
+            fileobj.write(chunk)
+    
     def generate_pdf(self) -> bytes:
         """
         Generate PDF report.
@@ -144,6 +198,20 @@ class JasperReport:
         Returns:
             PDF report as bytes
         """
+        buffer = BytesIO()
+        self.write_pdf(buffer)
+        return buffer.getvalue()
+    
+    def write_pdf(self, fileobj: BinaryIO):
+        """
+        Write PDF report directly to a binary file object.
+        
+        Output written before a render error stays in fileobj; save_report only creates the
+        file once the report is complete.
+        
+        Args:
+            fileobj: Writable binary file object
+        """
         if not self.data and self.report_def.query:
             self.execute_query()
         
@@ -153,9 +221,8 @@ class JasperReport:
             renderer.set_parameters(self.parameters)
             
             logger.info("Generating PDF report...")
-            result = renderer.render()
+            renderer.render_to(fileobj)
             logger.info("PDF report generated successfully")
-            return result
             
         except Exception as e:
             raise RenderError(f"PDF generation failed: {e}")
@@ -171,16 +238,27 @@ class JasperReport:
         format = format.lower()
         
         if format == 'html':
-            content = self.generate_html()
+            write = self.write_html
         elif format == 'pdf':
-            content = self.generate_pdf()
+            write = self.write_pdf
         else:
             raise JasperError(f"Unsupported format: {format}")
         
         try:
-            with open(output_path, 'wb') as f:
-                f.write(content)
+            # Render into a temporary file beside the target and move it into place once the
+            # report is complete, so a failed render leaves no partial output behind
+            temp_path = f"{output_path}.{uuid.uuid4().hex}.part"
+            try:
+                with open(temp_path, 'xb') as f:
+                    write(f)
+                os.replace(temp_path, output_path)
+            except BaseException:
+                with suppress(OSError):
+                    os.unlink(temp_path)
+                raise
             logger.info(f"Report saved to: {output_path}")
+        except (JasperError, DatabaseError, RenderError):
+            raise
         except Exception as e:
             raise JasperError(f"Failed to save report: {e}")
     
@@ -229,14 +307,13 @@ class JasperReport:
             warnings.append("No detail band defined")
         
         # Check field usage in expressions
+        field_names = {f.name for f in self.report_def.fields}
         for band in self.report_def.bands.values():
             for element in band.elements:
                 if element.expression:
                     # Simple check for field references
-                    import re
-                    field_refs = re.findall(r'\$F\{([^}]+)\}', element.expression)
-                    for field_ref in field_refs:
-                        if not any(f.name == field_ref for f in self.report_def.fields):
+                    for field_ref in _FIELD_RE.findall(element.expression):
+                        if field_ref not in field_names:
                             issues.append(f"Referenced field '{field_ref}' not defined")
         
         # Test database connection if configured
@@ -282,7 +359,8 @@ class JasperReport:
                         elif self.database_engine.db_type == 'postgresql':
                             query += f" LIMIT {limit}"
                     
-                    preview_data = self.database_engine.execute_query(query, self.parameters)
+                    # Only `limit` rows are fetched even when the query could not be limited
+                    preview_data = self.database_engine.execute_query(query, self.parameters, max_rows=limit)
                     return preview_data[:limit]
                 except Exception as e:
                     logger.warning(f"Failed to preview data: {e}")
@@ -336,15 +414,13 @@ class JasperReport:
         Returns:
             Base64 encoded chart image
         """
-        chart_renderer = ChartRenderer()
-        
         if data_source == 'current':
             chart_data = self.data
         else:
             # Could support other data sources in the future
             chart_data = self.data
         
-        return chart_renderer.create_chart(chart_type, chart_data, config)
+        return self.chart_renderer.create_chart(chart_type, chart_data, config)
     
     def __enter__(self):
         """Context manager entry."""
@@ -4,10 +4,67 @@ Database connection and query execution functionality.
 
 import sqlite3
 import os
+import threading
+import time
+from decimal import Decimal
+from numbers import Real
 from typing import List, Dict, Any, Optional, Union
 from urllib.parse import urlparse
 from .exceptions import DatabaseError
 
+# Idle MySQL/PostgreSQL connections kept per connection string, so later engines skip the connect
+# round trips. SQLite opens are just a file open and are not pooled.
+POOL_SIZE = 10
+# Seconds after which a pooled connection is closed instead of reused (server-side idle timeouts)
+POOL_RECYCLE = 300
+_idle_connections: Dict[str, List[tuple]] = {}
+_pool_lock = threading.Lock()
+
+
+def _checkout_connection(connection_string: str):
+    """Take a live idle connection for the connection string, or (None, None) if there is none."""
+    now = time.monotonic()
+    while True:
+        with _pool_lock:
+            idle = _idle_connections.get(connection_string)
+            if not idle:
+                return None, None
+            opened_at, connection = idle.pop()
+        
+        if now - opened_at < POOL_RECYCLE:
+            # Pre-ping: drop connections the server has closed since they were returned
+            try:
+                cursor = connection.cursor()
+                cursor.execute("SELECT 1")
+                cursor.fetchall()
+                cursor.close()
+                # The ping opened a transaction; end it so the connection isn't left idle in it
+                connection.rollback()
+                return opened_at, connection
+            except Exception:
+                pass
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+
+def _checkin_connection(connection_string: str, opened_at: float, connection) -> bool:
+    """Return a connection to the idle pool; False if it is full and the caller should close it."""
+    if time.monotonic() - opened_at >= POOL_RECYCLE:
+        return False
+    try:
+        # End any open transaction so the next user starts clean
+        connection.rollback()
+    except Exception:
+        return False
+    with _pool_lock:
+        idle = _idle_connections.setdefault(connection_string, [])
+        if len(idle) >= POOL_SIZE:
+            return False
+        idle.append((opened_at, connection))
+    return True
+
 
 class DatabaseEngine:
     """Database engine for executing queries across different database types."""
@@ -16,6 +73,7 @@ class DatabaseEngine:
         self.connection_string = connection_string
         self.db_type = self._detect_db_type()
         self.connection = None
+        self._opened_at = None
     
     def _detect_db_type(self) -> str:
         """Detect database type from connection string."""
@@ -30,7 +88,15 @@ class DatabaseEngine:
     
     def connect(self):
         """Establish database connection."""
+        if self.db_type != 'sqlite':
+            opened_at, connection = _checkout_connection(self.connection_string)
+            if connection is not None:
+                self._opened_at = opened_at
+                self.connection = connection
+                return
+        
         try:
+            self._opened_at = time.monotonic()
             if self.db_type == 'sqlite':
                 db_path = self.connection_string.replace('sqlite:///', '')
                 if not os.path.exists(db_path):
@@ -66,13 +132,17 @@ class DatabaseEngine:
             raise DatabaseError(f"Failed to connect to database: {e}")
     
     def disconnect(self):
-        """Close database connection."""
+        """Close database connection, or hand a MySQL/PostgreSQL one back to the idle pool."""
         if self.connection:
-            self.connection.close()
+            if self.db_type == 'sqlite' or not _checkin_connection(
+                self.connection_string, self._opened_at, self.connection
+            ):
+                self.connection.close()
             self.connection = None
     
-    def execute_query(self, query: str, parameters: Dict[str, Any] = None) -> List[Dict[str, Any]]:
-        """Execute a SQL query and return results."""
+    def execute_query(self, query: str, parameters: Dict[str, Any] = None,
+                      max_rows: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Execute a SQL query and return results; with max_rows, only that many rows are fetched."""
         if not self.connection:
             self.connect()
         
@@ -88,7 +158,7 @@ class DatabaseEngine:
                     cursor.execute(query)
                 
                 columns = [description[0] for description in cursor.description]
-                rows = cursor.fetchall()
+                rows = cursor.fetchall() if max_rows is None else cursor.fetchmany(max_rows)
                 
                 result = []
                 for row in rows:
@@ -102,7 +172,7 @@ class DatabaseEngine:
             elif self.db_type == 'mysql':
                 cursor.execute(query, parameters or {})
                 columns = [desc[0] for desc in cursor.description]
-                rows = cursor.fetchall()
+                rows = cursor.fetchall() if max_rows is None else cursor.fetchmany(max_rows)
                 
                 result = []
                 for row in rows:
@@ -117,7 +187,7 @@ class DatabaseEngine:
                 import psycopg2.extras
                 cursor = self.connection.cursor(cursor_factory=psycopg2.extras.DictCursor)
                 cursor.execute(query, parameters or {})
-                rows = cursor.fetchall()
+                rows = cursor.fetchall() if max_rows is None else cursor.fetchmany(max_rows)
                 
                 result = []
                 for row in rows:
@@ -258,6 +328,18 @@ class DatabaseEngine:
         self.disconnect()
 
 
+def _numeric_value(value: Any) -> float:
+    """Value of a field as summed: numbers (Decimal and bool included) and numeric strings, else 0."""
+    if isinstance(value, (Real, Decimal)):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            return float(value)
+        except ValueError:
+            pass
+    return 0.0
+
+
 class DataProcessor:
     """Processes data for report generation including grouping and aggregations."""
     
@@ -279,14 +361,7 @@ class DataProcessor:
         data_to_process = group_data if group_data is not None else self.data
         total = 0.0
         for row in data_to_process:
-            value = row.get(field, 0)
-            if isinstance(value, (int, float)):
-                total += value
-            elif isinstance(value, str):
-                try:
-                    total += float(value)
-                except ValueError:
-                    pass
+            total += _numeric_value(row.get(field, 0))
         return total
     
     def calculate_average(self, field: str, group_data: List[Dict[str, Any]] = None) -> float:
@@ -298,6 +373,14 @@ class DataProcessor:
         total = self.calculate_sum(field, data_to_process)
         return total / len(data_to_process)
     
+    def aggregate(self, group_field: str, value_field: str) -> Dict[Any, Dict[str, float]]:
+        """Calculate sum and average of a field for each group."""
+        result = {}
+        for key, rows in self.group_by(group_field).items():
+            total = self.calculate_sum(value_field, rows)
+            result[key] = {'sum': total, 'average': total / len(rows)}
+        return result
+    
     def calculate_count(self, group_data: List[Dict[str, Any]] = None) -> int:
         """Calculate count of rows."""
         data_to_process = group_data if group_data is not None else self.data
@@ -2,8 +2,9 @@
 JRXML parsing and processing functionality.
 """
 
-import xml.etree.ElementTree as ET
 import re
+import threading
+from lxml import etree
 from typing import Dict, List, Any, Optional, Union
 from dataclasses import dataclass, field
 from .exceptions import JRXMLParseError
@@ -79,21 +80,57 @@ class ReportDefinition:
     parameters: Dict[str, Any] = field(default_factory=dict)
 
 
+# lxml refuses str input that still carries an encoding declaration
+_XML_DECLARATION_RE = re.compile(r'^\s*<\?xml[^>]*\?>')
+
+
+# lxml parsers may not be shared between threads, so each thread builds its own and reuses them
+_parser_local = threading.local()
+
+
+def _thread_parser(name: str, resolve_entities: bool) -> etree.XMLParser:
+    """This thread's parser of the given name, created on first use."""
+    parser = getattr(_parser_local, name, None)
+    if parser is None:
+        parser = etree.XMLParser(resolve_entities=resolve_entities, no_network=True,
+                                 remove_comments=True, remove_pis=True)
+        setattr(_parser_local, name, parser)
+    return parser
+
+
+def _parse_xml(content: Union[str, bytes]) -> etree._Element:
+    """Parse JRXML with libxml2; like ElementTree, drops comments and processing instructions and
+    expands internal entities, while external entities are refused rather than loaded."""
+    if isinstance(content, str):
+        content = _XML_DECLARATION_RE.sub('', content, count=1)
+    root = etree.fromstring(content, _thread_parser('plain', resolve_entities=False))
+    
+    # Only documents declaring entities need a second pass, with substitution on
+    dtd = root.getroottree().docinfo.internalDTD
+    entities = list(dtd.iterentities()) if dtd is not None else []
+    if entities:
+        external = [entity.name for entity in entities if entity.system_url]
+        if external:
+            raise JRXMLParseError(f"External entities are not supported: {', '.join(external)}")
+        root = etree.fromstring(content, _thread_parser('entities', resolve_entities=True))
+    return root
+
+
+def _strip_namespaces(root: etree._Element):
+    """Drop namespace URIs from every tag so lookups can use bare element names."""
+    for elem in root.iter(etree.Element):
+        if '}' in elem.tag:
+            elem.tag = elem.tag.split('}', 1)[1]
+
+
 class JRXMLParser:
     """Parser for JRXML files."""
     
-    def __init__(self):
-        self.namespace = {'jr': 'http://jasperreports.sourceforge.net/jasperreports'}
-    
-    def parse(self, jrxml_content: str) -> ReportDefinition:
+    def parse(self, jrxml_content: Union[str, bytes]) -> ReportDefinition:
         """Parse JRXML content and return a ReportDefinition."""
         try:
-            root = ET.fromstring(jrxml_content)
-            
-            # Update namespace if different
-            if root.tag.startswith('{'):
-                ns_url = root.tag[1:root.tag.index('}')]
-                self.namespace = {'jr': ns_url}
+            root = _parse_xml(jrxml_content)
+            _strip_namespaces(root)
             
             # Extract basic report properties
             report_def = ReportDefinition(
@@ -127,16 +164,16 @@ class JRXMLParser:
             
             return report_def
             
-        except ET.ParseError as e:
+        except JRXMLParseError:
+            raise
+        except etree.XMLSyntaxError as e:
             raise JRXMLParseError(f"Invalid XML: {e}")
         except Exception as e:
             raise JRXMLParseError(f"Failed to parse JRXML: {e}")
     
-    def _parse_query(self, root: ET.Element) -> Optional[str]:
+    def _parse_query(self, root: etree._Element) -> Optional[str]:
         """Parse the query string from JRXML."""
-        query_elem = root.find('.//jr:queryString', self.namespace)
-        if query_elem is None:
-            query_elem = root.find('.//queryString')
+        query_elem = root.find('.//queryString')
         
         if query_elem is not None and query_elem.text:
             query = query_elem.text.strip()
@@ -146,12 +183,10 @@ class JRXMLParser:
             return query.strip()
         return None
     
-    def _parse_fields(self, root: ET.Element) -> List[Field]:
+    def _parse_fields(self, root: etree._Element) -> List[Field]:
         """Parse field definitions from JRXML."""
         fields = []
-        field_elements = root.findall('.//jr:field', self.namespace)
-        if not field_elements:
-            field_elements = root.findall('.//field')
+        field_elements = root.findall('.//field')
         
         for field_elem in field_elements:
             name = field_elem.get('name')
@@ -162,9 +197,7 @@ class JRXMLParser:
                 )
                 
                 # Check for description
-                desc_elem = field_elem.find('jr:fieldDescription', self.namespace)
-                if desc_elem is None:
-                    desc_elem = field_elem.find('fieldDescription')
+                desc_elem = field_elem.find('fieldDescription')
                 if desc_elem is not None and desc_elem.text:
                     field.description = desc_elem.text.strip()
                 
@@ -172,12 +205,10 @@ class JRXMLParser:
         
         return fields
     
-    def _parse_variables(self, root: ET.Element) -> List[Variable]:
+    def _parse_variables(self, root: etree._Element) -> List[Variable]:
         """Parse variable definitions from JRXML."""
         variables = []
-        var_elements = root.findall('.//jr:variable', self.namespace)
-        if not var_elements:
-            var_elements = root.findall('.//variable')
+        var_elements = root.findall('.//variable')
         
         for var_elem in var_elements:
             name = var_elem.get('name')
@@ -191,16 +222,12 @@ class JRXMLParser:
                 )
                 
                 # Parse variable expression
-                expr_elem = var_elem.find('jr:variableExpression', self.namespace)
-                if expr_elem is None:
-                    expr_elem = var_elem.find('variableExpression')
+                expr_elem = var_elem.find('variableExpression')
                 if expr_elem is not None and expr_elem.text:
                     variable.expression = expr_elem.text.strip()
                 
                 # Parse initial value
-                init_elem = var_elem.find('jr:initialValueExpression', self.namespace)
-                if init_elem is None:
-                    init_elem = var_elem.find('initialValueExpression')
+                init_elem = var_elem.find('initialValueExpression')
                 if init_elem is not None and init_elem.text:
                     variable.initial_value = init_elem.text.strip()
                 
@@ -208,20 +235,16 @@ class JRXMLParser:
         
         return variables
     
-    def _parse_groups(self, root: ET.Element) -> List[Group]:
+    def _parse_groups(self, root: etree._Element) -> List[Group]:
         """Parse group definitions from JRXML."""
         groups = []
-        group_elements = root.findall('.//jr:group', self.namespace)
-        if not group_elements:
-            group_elements = root.findall('.//group')
+        group_elements = root.findall('.//group')
         
         for group_elem in group_elements:
             name = group_elem.get('name')
             if name:
                 # Parse group expression
-                expr_elem = group_elem.find('jr:groupExpression', self.namespace)
-                if expr_elem is None:
-                    expr_elem = group_elem.find('groupExpression')
+                expr_elem = group_elem.find('groupExpression')
                 
                 expression = ""
                 if expr_elem is not None and expr_elem.text:
@@ -230,16 +253,12 @@ class JRXMLParser:
                 group = Group(name=name, expression=expression)
                 
                 # Parse header height
-                header_elem = group_elem.find('jr:groupHeader/jr:band', self.namespace)
-                if header_elem is None:
-                    header_elem = group_elem.find('groupHeader/band')
+                header_elem = group_elem.find('groupHeader/band')
                 if header_elem is not None:
                     group.header_height = int(header_elem.get('height', 0))
                 
                 # Parse footer height
-                footer_elem = group_elem.find('jr:groupFooter/jr:band', self.namespace)
-                if footer_elem is None:
-                    footer_elem = group_elem.find('groupFooter/band')
+                footer_elem = group_elem.find('groupFooter/band')
                 if footer_elem is not None:
                     group.footer_height = int(footer_elem.get('height', 0))
                 
@@ -247,7 +266,7 @@ class JRXMLParser:
         
         return groups
     
-    def _parse_bands(self, root: ET.Element) -> Dict[str, Band]:
+    def _parse_bands(self, root: etree._Element) -> Dict[str, Band]:
         """Parse all bands from JRXML."""
         bands = {}
         
@@ -257,9 +276,7 @@ class JRXMLParser:
         ]
         
         for band_type in band_types:
-            band_elem = root.find(f'.//jr:{band_type}/jr:band', self.namespace)
-            if band_elem is None:
-                band_elem = root.find(f'.//{band_type}/band')
+            band_elem = root.find(f'.//{band_type}/band')
             
             if band_elem is not None:
                 height = int(band_elem.get('height', 0))
@@ -269,49 +286,39 @@ class JRXMLParser:
         
         return bands
     
-    def _parse_band_elements(self, band_elem: ET.Element) -> List[ReportElement]:
+    def _parse_band_elements(self, band_elem: etree._Element) -> List[ReportElement]:
         """Parse elements within a band."""
         elements = []
         
         # Parse static text elements
-        static_texts = band_elem.findall('.//jr:staticText', self.namespace)
-        if not static_texts:
-            static_texts = band_elem.findall('.//staticText')
+        static_texts = band_elem.findall('.//staticText')
         
         for static_elem in static_texts:
             element = self._parse_element(static_elem, 'staticText')
             if element:
                 # Get text content
-                text_elem = static_elem.find('jr:text', self.namespace)
-                if text_elem is None:
-                    text_elem = static_elem.find('text')
+                text_elem = static_elem.find('text')
                 if text_elem is not None and text_elem.text:
                     element.content = text_elem.text.strip()
                 elements.append(element)
         
         # Parse text field elements
-        text_fields = band_elem.findall('.//jr:textField', self.namespace)
-        if not text_fields:
-            text_fields = band_elem.findall('.//textField')
+        text_fields = band_elem.findall('.//textField')
         
         for field_elem in text_fields:
             element = self._parse_element(field_elem, 'textField')
             if element:
                 # Get expression
-                expr_elem = field_elem.find('jr:textFieldExpression', self.namespace)
-                if expr_elem is None:
-                    expr_elem = field_elem.find('textFieldExpression')
+                expr_elem = field_elem.find('textFieldExpression')
                 if expr_elem is not None and expr_elem.text:
                     element.expression = expr_elem.text.strip()
                 elements.append(element)
         
         return elements
     
-    def _parse_element(self, elem: ET.Element, element_type: str) -> Optional[ReportElement]:
+    def _parse_element(self, elem: etree._Element, element_type: str) -> Optional[ReportElement]:
         """Parse a report element (static text or text field)."""
-        report_elem = elem.find('jr:reportElement', self.namespace)
-        if report_elem is None:
-            report_elem = elem.find('reportElement')
+        report_elem = elem.find('reportElement')
         
         if report_elem is not None:
             return ReportElement(
@@ -324,23 +331,19 @@ class JRXMLParser:
             )
         return None
     
-    def _parse_style(self, elem: ET.Element) -> Dict[str, Any]:
+    def _parse_style(self, elem: etree._Element) -> Dict[str, Any]:
         """Parse style information from an element."""
         style = {}
         
         # Parse text element style
-        text_elem = elem.find('jr:textElement', self.namespace)
-        if text_elem is None:
-            text_elem = elem.find('textElement')
+        text_elem = elem.find('textElement')
         
         if text_elem is not None:
             style['textAlignment'] = text_elem.get('textAlignment', 'Left')
             style['verticalAlignment'] = text_elem.get('verticalAlignment', 'Top')
             
             # Parse font
-            font_elem = text_elem.find('jr:font', self.namespace)
-            if font_elem is None:
-                font_elem = text_elem.find('font')
+            font_elem = text_elem.find('font')
             
             if font_elem is not None:
                 style['fontSize'] = int(font_elem.get('size', 10))
@@ -351,12 +354,10 @@ class JRXMLParser:
         
         return style
     
-    def _parse_parameters(self, root: ET.Element) -> Dict[str, Any]:
+    def _parse_parameters(self, root: etree._Element) -> Dict[str, Any]:
         """Parse parameter definitions from JRXML."""
         parameters = {}
-        param_elements = root.findall('.//jr:parameter', self.namespace)
-        if not param_elements:
-            param_elements = root.findall('.//parameter')
+        param_elements = root.findall('.//parameter')
         
         for param_elem in param_elements:
             name = param_elem.get('name')
@@ -364,9 +365,7 @@ class JRXMLParser:
                 param_class = param_elem.get('class', 'java.lang.String')
                 
                 # Get default value
-                default_elem = param_elem.find('jr:defaultValueExpression', self.namespace)
-                if default_elem is None:
-                    default_elem = param_elem.find('defaultValueExpression')
+                default_elem = param_elem.find('defaultValueExpression')
                 
                 default_value = None
                 if default_elem is not None and default_elem.text:
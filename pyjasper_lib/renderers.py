@@ -43,15 +43,19 @@ class HTMLRenderer(BaseRenderer):
     
     def render(self) -> bytes:
         """Render the report to HTML."""
+        return b''.join(self.iter_render())
+    
+    def iter_render(self):
+        """Render the report to HTML, yielding UTF-8 encoded chunks band by band."""
         try:
-            html_content = self._generate_html()
-            return html_content.encode('utf-8')
+            for chunk in self._iter_html():
+                yield chunk.encode('utf-8')
         except Exception as e:
             raise RenderError(f"HTML rendering failed: {e}")
     
-    def _generate_html(self) -> str:
-        """Generate the complete HTML document."""
-        html = f"""<!DOCTYPE html>
+    def _iter_html(self):
+        """Generate the HTML document as a sequence of string chunks."""
+        yield f"""<!DOCTYPE html>
 <html>
 <head>
     <meta charset="UTF-8">
@@ -60,15 +64,20 @@ class HTMLRenderer(BaseRenderer):
 </head>
 <body>
     <div class="report-container">
-        {self._render_title()}
-        {self._render_page_header()}
-        {self._render_content()}
-        {self._render_page_footer()}
-        {self._render_summary()}
+        """
+        yield self._render_title()
+        yield "\n        "
+        yield self._render_page_header()
+        yield "\n        "
+        yield self._render_content()
+        yield "\n        "
+        yield self._render_page_footer()
+        yield "\n        "
+        yield self._render_summary()
+        yield """
     </div>
 </body>
 </html>"""
-        return html
     
     def _generate_css(self) -> str:
         """Generate CSS styles based on JRXML definition only."""
@@ -401,6 +410,12 @@ class PDFRenderer(BaseRenderer):
     
     def render(self) -> bytes:
         """Render the report to PDF based on JRXML structure."""
+        buffer = BytesIO()
+        self.render_to(buffer)
+        return buffer.getvalue()
+    
+    def render_to(self, fileobj):
+        """Render the report to PDF, writing directly into a binary file object."""
         try:
             from reportlab.lib.pagesizes import letter, A4
             from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
@@ -410,13 +425,11 @@ class PDFRenderer(BaseRenderer):
             from reportlab.platypus.flowables import Flowable
             from reportlab.graphics.shapes import Drawing, String, Rect
             
-            buffer = BytesIO()
-            
             # Calculate page size from report definition
             page_size = (self.report_def.page_width, self.report_def.page_height)
             
             doc = SimpleDocTemplate(
-                buffer,
+                fileobj,
                 pagesize=page_size,
                 leftMargin=self.report_def.left_margin,
                 rightMargin=self.report_def.right_margin,
@@ -449,8 +462,6 @@ class PDFRenderer(BaseRenderer):
                 story.extend(self._render_pdf_page_footer())
             
             doc.build(story)
-            buffer.seek(0)
-            return buffer.getvalue()
             
         except Exception as e:
             raise RenderError(f"PDF rendering failed: {e}")
@@ -4,12 +4,16 @@ Subreport and cross-reference support for PyJasper.
 
 from typing import Dict, List, Any, Optional
 import os
+import re
 from pathlib import Path
 
 from .core import JasperReport
 from .parsers import ReportDefinition
 from .exceptions import JasperError
 
+# Template placeholders such as {{TITLE}}; the group keeps them in re.split output
+_PLACEHOLDER_RE = re.compile(r'(\{\{\w+\}\})')
+
 
 class SubreportManager:
     """Manages subreports and their execution."""
@@ -186,6 +190,8 @@ class TemplateManager:
         """
         self.template_dir = Path(template_dir)
         self.templates: Dict[str, str] = {}
+        # Templates pre-split into alternating literal text and placeholder tokens
+        self._compiled: Dict[str, List[str]] = {}
         self._load_templates()
     
     def _load_templates(self):
@@ -227,15 +233,30 @@ class TemplateManager:
         Returns:
             JasperReport instance
         """
-        template_content = self.get_template(template_name)
+        if not replacements:
+            return JasperReport(jrxml_content=self.get_template(template_name))
+        
+        # Fill placeholder slots of the compiled template in a single pass
+        parts = list(self._compile_template(template_name))
+        for i in range(1, len(parts), 2):
+            parts[i] = replacements.get(parts[i], parts[i])
+        template_content = ''.join(parts)
         
-        # Apply replacements
-        if replacements:
-            for old_value, new_value in replacements.items():
+        # Any other replacement keys are plain substrings
+        for old_value, new_value in replacements.items():
+            if not _PLACEHOLDER_RE.fullmatch(old_value):
                 template_content = template_content.replace(old_value, new_value)
         
         return JasperReport(jrxml_content=template_content)
     
+    def _compile_template(self, name: str) -> List[str]:
+        """Split a template on its placeholders once and reuse the result."""
+        parts = self._compiled.get(name)
+        if parts is None:
+            parts = _PLACEHOLDER_RE.split(self.get_template(name))
+            self._compiled[name] = parts
+        return parts
+    
     def save_template(self, name: str, jrxml_content: str):
         """
         Save a new template.
@@ -252,6 +273,7 @@ class TemplateManager:
                 f.write(jrxml_content)
             
             self.templates[name] = jrxml_content
+            self._compiled.pop(name, None)
         except Exception as e:
             raise JasperError(f"Failed to save template '{name}': {e}")
     
@@ -268,6 +290,7 @@ class TemplateManager:
         """
         if name in self.templates:
             del self.templates[name]
+        self._compiled.pop(name, None)
         
         template_path = self.template_dir / f"{name}.jrxml"
         if template_path.exists():
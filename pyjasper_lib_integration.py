@@ -2,19 +2,24 @@
 Integration module to use PyJasper library with the existing Flask application.
 """
 
-from pyjasper_lib import JasperReport
+from pyjasper_lib.cache import LRUCache
 from pyjasper_lib.exceptions import JasperError, JRXMLParseError, DatabaseError, RenderError
+import hashlib
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Number of distinct JRXML documents whose validation result is kept
+VALIDATION_CACHE_SIZE = 32
+
 
 class PyJasperIntegration:
     """Integration class for using PyJasper library in the Flask app."""
     
     def __init__(self):
         """Initialize the integration."""
-        pass
+        # Validation results keyed by content hash
+        self._validation_cache = LRUCache(VALIDATION_CACHE_SIZE)
     
     def generate_report(self, jrxml_content: str, connection_string: str = None, 
                        output_format: str = 'html', parameters: dict = None) -> tuple:
@@ -31,23 +36,24 @@ class PyJasperIntegration:
             Tuple of (content_bytes, error_message)
         """
         try:
-            # Create report instance
-            report = JasperReport(jrxml_content=jrxml_content)
-            
-            # Set database connection if provided
-            if connection_string:
-                report.set_database_connection(connection_string)
-            
-            # Set parameters if provided
-            if parameters:
-                report.set_parameters(parameters)
+            from pyjasper_lib import JasperReport
             
-            # Generate report based on format
-            if output_format.lower() == 'pdf':
-                content = report.generate_pdf()
-            else:
-                content = report.generate_html()
+            # Create report instance; leaving the block hands its database connection back
+            with JasperReport(jrxml_content=jrxml_content) as report:
+                # Set database connection if provided
+                if connection_string:
+                    report.set_database_connection(connection_string)
                 
+                # Set parameters if provided
+                if parameters:
+                    report.set_parameters(parameters)
+                
+                # Generate report based on format
+                if output_format.lower() == 'pdf':
+                    content = report.generate_pdf()
+                else:
+                    content = report.generate_html()
+            
             # Clean up any fallback messages from HTML content
             if output_format.lower() == 'html' and content:
                 content_str = content.decode('utf-8') if isinstance(content, bytes) else str(content)
@@ -85,22 +91,33 @@ class PyJasperIntegration:
         Returns:
             Dictionary with validation results
         """
+        # The editor revalidates the same document repeatedly; reuse the last result for it
+        key = hashlib.blake2b(jrxml_content.encode('utf-8'), digest_size=16).digest()
+        cached = self._validation_cache.get(key)
+        if cached is not None:
+            return cached
+        
         try:
+            from pyjasper_lib import JasperReport
+            
             report = JasperReport(jrxml_content=jrxml_content)
             validation = report.validate_report()
-            return {
+            result = {
                 'valid': validation['valid'],
                 'issues': validation['issues'],
                 'warnings': validation['warnings'],
                 'info': report.get_report_info()
             }
         except Exception as e:
-            return {
+            result = {
                 'valid': False,
                 'issues': [f"Validation failed: {str(e)}"],
                 'warnings': [],
                 'info': {}
             }
+        
+        self._validation_cache.put(key, result)
+        return result
     
     def preview_data(self, jrxml_content: str, connection_string: str, limit: int = 10) -> tuple:
         """
@@ -115,14 +132,15 @@ class PyJasperIntegration:
             Tuple of (data_list, error_message)
         """
         try:
-            report = JasperReport(jrxml_content=jrxml_content)
+            from pyjasper_lib import JasperReport
             
-            if connection_string:
-                report.set_database_connection(connection_string)
-                data = report.preview_data(limit)
-                return data, None
-            else:
-                return [], "No database connection provided"
+            with JasperReport(jrxml_content=jrxml_content) as report:
+                if connection_string:
+                    report.set_database_connection(connection_string)
+                    data = report.preview_data(limit)
+                    return data, None
+                else:
+                    return [], "No database connection provided"
                 
         except Exception as e:
             logger.error(f"Data preview error: {e}")
@@ -142,22 +160,25 @@ class PyJasperIntegration:
             from pyjasper_lib.database import DatabaseEngine
             
             engine = DatabaseEngine(connection_string)
-            tables = engine.get_tables()
-            
-            schema_info = {
-                'database_type': engine.db_type,
-                'tables': []
-            }
-            
-            for table in tables:
-                try:
-                    columns = engine.get_table_schema(table)
-                    schema_info['tables'].append({
-                        'name': table,
-                        'columns': columns
-                    })
-                except Exception as e:
-                    logger.warning(f"Failed to get schema for table {table}: {e}")
+            try:
+                tables = engine.get_tables()
+                
+                schema_info = {
+                    'database_type': engine.db_type,
+                    'tables': []
+                }
+                
+                for table in tables:
+                    try:
+                        columns = engine.get_table_schema(table)
+                        schema_info['tables'].append({
+                            'name': table,
+                            'columns': columns
+                        })
+                    except Exception as e:
+                        logger.warning(f"Failed to get schema for table {table}: {e}")
+            finally:
+                engine.disconnect()
             
             return schema_info, None
             
@@ -181,7 +202,10 @@ class PyJasperIntegration:
             from pyjasper_lib.core import ReportBuilder
             
             engine = DatabaseEngine(connection_string)
-            schema = engine.get_table_schema(table_name)
+            try:
+                schema = engine.get_table_schema(table_name)
+            finally:
+                engine.disconnect()
             
             # Create report builder
             builder = ReportBuilder(f"{table_name.title()} Report")
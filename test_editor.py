@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+"""
+Tests for the JRXML editor routes and its JasperReports engine.
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import types
+import unittest
+from collections import defaultdict
+from io import BytesIO
+from pathlib import Path
+from unittest import mock
+
+from sqlalchemy.engine import Engine
+
+from app import create_app
+from config import db
+from jasper_report_editor import jasper_engine, manager, routes
+from jasper_report_editor.fsutil import private_directory
+from jasper_report_editor.jasper_engine import JasperEngine
+from jasper_report_editor.models import DatabaseConnection
+
+
+def make_test_app(test_class):
+    """Create an app whose database and PDF previews live in a temporary directory that is
+    removed, with the app's connections, after the test class has run."""
+    instance_dir = tempfile.TemporaryDirectory()
+    app = create_app({
+        'instance_path': instance_dir.name,
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{instance_dir.name}/jasper_reports.db',
+    })
+    
+    def cleanup():
+        with app.app_context():
+            db.engine.dispose()
+        instance_dir.cleanup()
+    test_class.addClassCleanup(cleanup)
+    return app
+
+
+class TestEditorUpload(unittest.TestCase):
+    """Test uploading a JRXML file to the editor."""
+    
+    @classmethod
+    def setUpClass(cls):
+        """Create the app once for all tests, with its instance folder in a temporary directory."""
+        cls.app = make_test_app(cls)
+    
+    def setUp(self):
+        """Create a test client; uploads are not written to disk."""
+        self.client = self.app.test_client()
+        patcher = mock.patch.object(routes, '_upload_writer')
+        self.upload_writer = patcher.start()
+        self.addCleanup(patcher.stop)
+    
+    def test_upload_utf8(self):
+        """Test that an uploaded file is shown in the editor."""
+        jrxml = '<jasperReport name="Überblick"/>'.encode('utf-8')
+        response = self.client.post('/editor/', data={'jrxml': (BytesIO(jrxml), 'report.jrxml')},
+                                    content_type='multipart/form-data')
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Überblick', response.get_data(as_text=True))
+        self.upload_writer.submit.assert_called_once()
+    
+    def test_upload_not_utf8(self):
+        """Test that a file that is not UTF-8 is shown with replacement characters."""
+        jrxml = b'<jasperReport name="\xff\xfe"/>'
+        response = self.client.post('/editor/', data={'jrxml': (BytesIO(jrxml), 'report.jrxml')},
+                                    content_type='multipart/form-data')
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('��', response.get_data(as_text=True))
+
+
+class TestPdfPreview(unittest.TestCase):
+    """Test storing and serving generated PDFs."""
+    
+    @classmethod
+    def setUpClass(cls):
+        """Create the app once for all tests, with its instance folder in a temporary directory."""
+        cls.app = make_test_app(cls)
+    
+    def test_stash_and_fetch(self):
+        """Test that a stored PDF is served by its token from a private directory."""
+        with self.app.test_request_context():
+            token = routes._stash_pdf(b'%PDF-1.4 test')
+            directory = routes._pdf_preview_dir()
+        self.addCleanup(os.unlink, directory / f'{token}.pdf')
+        
+        self.assertEqual(os.stat(directory).st_mode & 0o777, 0o700)
+        response = self.app.test_client().get(f'/editor/preview/pdf/{token}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, b'%PDF-1.4 test')
+        response.close()
+    
+    def test_unknown_token(self):
+        """Test that tokens without a stored PDF are not found."""
+        client = self.app.test_client()
+        
+        self.assertEqual(client.get('/editor/preview/pdf/' + '0' * 32).status_code, 404)
+        self.assertEqual(client.get('/editor/preview/pdf/not-a-token').status_code, 404)
+    
+    def test_private_directory_rejects_open_permissions(self):
+        """Test that an existing directory others can access is refused."""
+        with tempfile.TemporaryDirectory() as parent:
+            path = os.path.join(parent, 'previews')
+            os.mkdir(path)
+            os.chmod(path, 0o755)
+            
+            with self.assertRaises(RuntimeError):
+                private_directory(path)
+    
+    def test_private_directory_rejects_symlink(self):
+        """Test that a symlink in place of the directory is refused."""
+        with tempfile.TemporaryDirectory() as parent:
+            target = os.path.join(parent, 'target')
+            os.mkdir(target, 0o700)
+            path = os.path.join(parent, 'previews')
+            os.symlink(target, path)
+            
+            with self.assertRaises(RuntimeError):
+                private_directory(path)
+
+
+class TestEngineCache(unittest.TestCase):
+    """Test the cache of SQLAlchemy engines used to test saved connections."""
+    
+    @classmethod
+    def setUpClass(cls):
+        """Create the app once for all tests, with its instance folder in a temporary directory."""
+        cls.app = make_test_app(cls)
+    
+    def setUp(self):
+        """Start from an empty cache, recording disposed engines."""
+        patcher = mock.patch.dict(manager._engines, clear=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(Engine, 'dispose', autospec=True)
+        self.dispose = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.directory = self.app.instance_path
+    
+    def connection_string(self, name):
+        """SQLite connection string for a database in the temporary instance folder."""
+        return f'sqlite:///{self.directory}/{name}.db'
+    
+    def test_evicted_engine_disposed(self):
+        """Test that the least recently used engine is disposed once over ENGINE_CACHE_SIZE."""
+        with mock.patch.object(manager, 'ENGINE_CACHE_SIZE', 2):
+            first = manager._get_engine(self.connection_string('first'))
+            second = manager._get_engine(self.connection_string('second'))
+            self.assertIs(manager._get_engine(self.connection_string('first')), first)
+            manager._get_engine(self.connection_string('third'))
+        
+        self.dispose.assert_called_once_with(second)
+        self.assertEqual(len(manager._engines), 2)
+    
+    def test_deleted_and_edited_connections_disposed(self):
+        """Test that engines for a changed or deleted connection are disposed and dropped."""
+        with self.app.app_context():
+            jasper_manager = self.app.extensions['jasper_manager']
+            old = jasper_manager.save_connection('reports', 'sqlite', database_name=f'{self.directory}/old.db')
+            old_engine = manager._get_engine(old)
+            new = jasper_manager.save_connection('reports', 'sqlite', database_name=f'{self.directory}/new.db')
+            self.dispose.assert_called_once_with(old_engine)
+            
+            new_engine = manager._get_engine(new)
+            connection_id = DatabaseConnection.query.filter_by(name='reports').one().id
+            self.assertTrue(jasper_manager.delete_connection(connection_id))
+        
+        self.dispose.assert_called_with(new_engine)
+        self.assertEqual(dict(manager._engines), {})
+
+
+class TestJasperEngineMetadata(unittest.TestCase):
+    """Test reading the title, fields and query out of a JRXML document."""
+    
+    def setUp(self):
+        """Create an engine."""
+        self.engine = JasperEngine()
+    
+    def test_declared_encoding(self):
+        """Test that text declared as ISO-8859-1 is not decoded a second time."""
+        jrxml = ('<?xml version="1.0" encoding="ISO-8859-1"?>\n'
+                 '<jasperReport name="Menu"><field name="dish" class="java.lang.String"/>'
+                 '<title><band height="30"><staticText><text>Café</text></staticText></band></title>'
+                 '</jasperReport>')
+        
+        title, fields, query = self.engine._extract_jrxml_metadata(jrxml)
+        
+        self.assertEqual(title, 'Café')
+        self.assertEqual(fields, {'dish': 'java.lang.String'})
+    
+    def test_internal_entities(self):
+        """Test that entities declared in an internal DTD are expanded."""
+        jrxml = ('<!DOCTYPE jasperReport [<!ENTITY company "Acme"><!ENTITY table "orders">]>\n'
+                 '<jasperReport name="Orders"><queryString>SELECT * FROM &table;</queryString>'
+                 '<title><band height="30"><staticText><text>&company; Report</text></staticText></band></title>'
+                 '</jasperReport>')
+        
+        title, fields, query = self.engine._extract_jrxml_metadata(jrxml)
+        
+        self.assertEqual(title, 'Acme Report')
+        self.assertEqual(query, 'SELECT * FROM orders')
+
+
+class TestJasperEngineRows(unittest.TestCase):
+    """Test reading report rows from a SQLite database, falling back to sample data."""
+    
+    fields = {'id': 'java.lang.Integer', 'amount': 'java.lang.Long'}
+    # abs() of the smallest integer overflows when its row is stepped to, mid-fetch
+    query = 'SELECT id, abs(value) AS amount FROM amounts'
+    
+    def setUp(self):
+        """Create an engine reading two rows per fetch, and record the cursors it opens."""
+        self.engine = JasperEngine()
+        patcher = mock.patch.object(jasper_engine, 'DB_FETCH_BATCH_SIZE', 2)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        
+        self.cursors = []
+        open_query = self.engine._open_report_query
+        def record(*args):
+            cursor = open_query(*args)
+            self.cursors.append(cursor)
+            return cursor
+        self.engine._open_report_query = record
+    
+    def connection_string(self, bad_row):
+        """Database of six rows whose amount overflows at bad_row (None for no overflow)."""
+        database = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+        database.close()
+        self.addCleanup(os.unlink, database.name)
+        with sqlite3.connect(database.name) as conn:
+            conn.execute('CREATE TABLE amounts (id INTEGER, value INTEGER)')
+            conn.executemany('INSERT INTO amounts VALUES (?, ?)',
+                             [(i, -2 ** 63 if i == bad_row else -i) for i in range(1, 7)])
+        conn.close()
+        return f'sqlite:///{database.name}'
+    
+    def assert_connection_closed(self):
+        """Check that the query's connection has been closed."""
+        with self.assertRaises(sqlite3.ProgrammingError):
+            self.cursors[0].connection.execute('SELECT 1')
+    
+    def test_rows(self):
+        """Test that rows come from the database in field order."""
+        rows = self.engine._get_sample_data(self.connection_string(None), self.query, self.fields)
+        
+        self.assertEqual(rows, [(i, i) for i in range(1, 7)])
+        self.assert_connection_closed()
+    
+    def test_failure_before_first_row(self):
+        """Test that a query failing in its first fetch yields sample rows."""
+        rows = list(self.engine._iter_report_rows(self.connection_string(2), self.query, self.fields))
+        
+        self.assertEqual(len(rows), jasper_engine.SAMPLE_ROW_COUNT)
+        self.assertNotEqual(rows[0], (1, 1))
+        self.assert_connection_closed()
+    
+    def test_failure_mid_fetch(self):
+        """Test that a query failing after its first batch still falls back to sample rows."""
+        rows = self.engine._get_sample_data(self.connection_string(5), self.query, self.fields)
+        
+        self.assertEqual(len(rows), jasper_engine.SAMPLE_ROW_COUNT)
+        self.assertNotIn((1, 1), rows)
+        self.assert_connection_closed()
+    
+    def test_csv_closes_query(self):
+        """Test that a CSV export failing while writing rows closes the query's connection."""
+        with mock.patch('csv.writer') as writer:
+            writer.return_value.writerows.side_effect = lambda rows: (next(rows), 1 / 0)
+            content, error = self.engine._generate_csv_fallback(
+                f'<jasperReport><queryString>{self.query}</queryString>'
+                '<field name="id"/><field name="amount"/></jasperReport>',
+                self.connection_string(None)
+            )
+        
+        self.assertIsNone(content)
+        self.assertIn('division by zero', error)
+        self.assert_connection_closed()
+
+
+class TestJasperEngineJVM(unittest.TestCase):
+    """Test the in-process JasperReports path against a stand-in for jpype."""
+    
+    def setUp(self):
+        """Install fake jpype and pyreportjasper modules that record the Java calls."""
+        self.java_classes = defaultdict(mock.MagicMock)
+        started = []
+        self.jpype = mock.MagicMock()
+        self.jpype.isJVMStarted.side_effect = lambda: bool(started)
+        self.jpype.startJVM.side_effect = lambda *args, **kwargs: started.append(True)
+        self.jpype.JClass.side_effect = lambda name: self.java_classes[name]
+        pyreportjasper = types.ModuleType('pyreportjasper')
+        pyreportjasper.__file__ = '/opt/pyreportjasper/__init__.py'
+        patcher = mock.patch.dict(sys.modules, {'jpype': self.jpype, 'pyreportjasper': pyreportjasper})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        
+        self.engine = JasperEngine()
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        self.engine._compile_cache_dir = Path(cache_dir.name)
+        self.jrxml = '<jasperReport name="Orders"/>'
+    
+    def test_compile_cache_is_private(self):
+        """Test that compiled reports are kept in a directory only this user can access."""
+        cache_dir = JasperEngine()._compile_cache_dir
+        
+        self.assertEqual(cache_dir.name, f'jasper_compiled_{os.getuid()}')
+        self.assertEqual(os.stat(cache_dir).st_mode & 0o777, 0o700)
+    
+    def java_class(self, name):
+        """The fake Java class for a fully qualified name."""
+        return self.java_classes[name]
+    
+    def test_generate_pdf(self):
+        """Test compiling from memory, filling with parameters and exporting a PDF."""
+        self.java_class('net.sf.jasperreports.engine.JasperExportManager').exportReportToPdf.return_value = b'%PDF-1.4'
+        
+        content, error = self.engine._generate_with_pyreportjasper(self.jrxml, None, 'pdf', {'title': 'Orders'})
+        
+        self.assertEqual((content, error), (b'%PDF-1.4', None))
+        self.java_class('java.io.ByteArrayInputStream').assert_called_once_with(self.jrxml.encode('utf-8'))
+        self.java_class('java.util.HashMap').return_value.put.assert_called_once_with('title', 'Orders')
+        fill_report = self.java_class('net.sf.jasperreports.engine.JasperFillManager').fillReport
+        empty_source = self.java_class('net.sf.jasperreports.engine.JREmptyDataSource').return_value
+        self.assertIs(fill_report.call_args[0][2], empty_source)
+    
+    def test_jvm_started_and_report_compiled_once(self):
+        """Test that repeated reports reuse the JVM and the compiled report."""
+        for _ in range(2):
+            self.engine._generate_with_pyreportjasper(self.jrxml, None, 'pdf', None)
+        
+        self.jpype.startJVM.assert_called_once()
+        classpath = self.jpype.startJVM.call_args.kwargs['classpath']
+        self.assertEqual(classpath[:2], ['/opt/pyreportjasper/libs/*', '/opt/pyreportjasper/libs/jdbc/*'])
+        compile_report = self.java_class('net.sf.jasperreports.engine.JasperCompileManager').compileReport
+        compile_report.assert_called_once()
+        fill_report = self.java_class('net.sf.jasperreports.engine.JasperFillManager').fillReport
+        self.assertEqual(fill_report.call_count, 2)
+    
+    def test_generate_html_with_database(self):
+        """Test filling from a JDBC connection that is closed afterwards, exported to HTML."""
+        stream = self.java_class('java.io.ByteArrayOutputStream').return_value
+        stream.toByteArray.return_value = b'<html></html>'
+        get_connection = self.java_class('java.sql.DriverManager').getConnection
+        
+        with tempfile.NamedTemporaryFile(suffix='.db') as database:
+            content, error = self.engine._generate_with_pyreportjasper(
+                self.jrxml, f'sqlite:///{database.name}', 'html', None
+            )
+        
+        self.assertEqual((content, error), (b'<html></html>', None))
+        get_connection.assert_called_once_with(f'jdbc:sqlite:{database.name}')
+        get_connection.return_value.close.assert_called_once()
+        self.java_class('net.sf.jasperreports.engine.export.HtmlExporter').return_value.exportReport.assert_called_once()
+    
+    def test_unsupported_format(self):
+        """Test that a format without an exporter is an error."""
+        with self.assertRaises(Exception):
+            self.engine._generate_with_pyreportjasper(self.jrxml, None, 'bogus', None)
+
+
+if __name__ == '__main__':
+    unittest.main()
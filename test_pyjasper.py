@@ -6,15 +6,23 @@ import unittest
 import tempfile
 import os
 import sqlite3
+import threading
+import time
+from decimal import Decimal
+from io import BytesIO
 from pathlib import Path
+from unittest import mock
 
 from pyjasper_lib import JasperReport, ReportBuilder
 from pyjasper_lib.parsers import JRXMLParser
+from pyjasper_lib.cache import LRUCache
+from pyjasper_lib import charts, core, database
 from pyjasper_lib.database import DatabaseEngine, DataProcessor
 from pyjasper_lib.renderers import HTMLRenderer, PDFRenderer
 from pyjasper_lib.charts import ChartRenderer, ImageHandler, FormattingUtils
 from pyjasper_lib.subreports import SubreportManager, CrossReferenceManager, TemplateManager, ReportComposer
-from pyjasper_lib.exceptions import JasperError, JRXMLParseError, DatabaseError
+from pyjasper_lib.exceptions import JasperError, JRXMLParseError, DatabaseError, RenderError
+from pyjasper_lib_integration import pyjasper_integration
 
 
 class TestJRXMLParser(unittest.TestCase):
@@ -126,6 +134,33 @@ class TestJRXMLParser(unittest.TestCase):
         
         with self.assertRaises(JRXMLParseError):
             parser.parse(invalid_xml)
+    
+    def test_internal_entities_expanded(self):
+        """Test that entities declared in an internal DTD are expanded."""
+        jrxml = '''<?xml version="1.0" encoding="UTF-8"?>
+<!DOCTYPE jasperReport [<!ENTITY company "Acme">]>
+<jasperReport name="&company;Report">
+    <title>
+        <band height="30">
+            <staticText>
+                <reportElement x="0" y="0" width="555" height="30"/>
+                <text>&company; Report</text>
+            </staticText>
+        </band>
+    </title>
+</jasperReport>'''
+        report_def = JRXMLParser().parse(jrxml)
+        
+        self.assertEqual(report_def.name, 'AcmeReport')
+        self.assertEqual(report_def.bands['title'].elements[0].content, 'Acme Report')
+    
+    def test_external_entities_refused(self):
+        """Test that an external entity is rejected instead of loaded."""
+        jrxml = '''<!DOCTYPE jasperReport [<!ENTITY secret SYSTEM "file:///etc/hostname">]>
+<jasperReport name="Report"><title><band height="30"/></title>&secret;</jasperReport>'''
+        
+        with self.assertRaises(JRXMLParseError):
+            JRXMLParser().parse(jrxml)
 
 
 class TestDatabaseEngine(unittest.TestCase):
@@ -173,6 +208,62 @@ class TestDatabaseEngine(unittest.TestCase):
         self.assertEqual(results[1]['name'], 'Bob')
         self.assertEqual(results[2]['name'], 'Charlie')
     
+    def test_execute_query_max_rows(self):
+        """Test that max_rows caps the fetched rows."""
+        engine = DatabaseEngine(self.connection_string)
+        query = "SELECT * FROM test_table ORDER BY name"
+        
+        self.assertEqual([row['name'] for row in engine.execute_query(query, max_rows=2)], ['Alice', 'Bob'])
+        self.assertEqual(len(engine.execute_query(query, max_rows=10)), 3)
+        self.assertEqual(len(engine.execute_query(query)), 3)
+    
+    def test_preview_data_limit(self):
+        """Test that previews stop at the limit while the full report keeps every row."""
+        jrxml = '''<?xml version="1.0" encoding="UTF-8"?>
+<jasperReport xmlns="http://jasperreports.sourceforge.net/jasperreports" name="PreviewReport">
+    <queryString><![CDATA[SELECT name, amount FROM test_table ORDER BY name LIMIT 100]]></queryString>
+    <field name="name" class="java.lang.String"/>
+    <field name="amount" class="java.lang.Double"/>
+    <detail>
+        <band height="20">
+            <textField>
+                <reportElement x="0" y="0" width="200" height="20"/>
+                <textFieldExpression><![CDATA[$F{name}]]></textFieldExpression>
+            </textField>
+        </band>
+    </detail>
+</jasperReport>'''
+        
+        with JasperReport(jrxml_content=jrxml) as report:
+            report.set_database_connection(self.connection_string)
+            
+            # The query has its own LIMIT, so only max_rows keeps the fetch short
+            engine = report.database_engine
+            with mock.patch.object(engine, 'execute_query', wraps=engine.execute_query) as execute_query:
+                preview = report.preview_data(limit=2)
+            self.assertEqual(execute_query.call_args.kwargs['max_rows'], 2)
+            self.assertEqual([row['name'] for row in preview], ['Alice', 'Bob'])
+            self.assertEqual(report.data, [])
+            
+            self.assertEqual(len(report.execute_query()), 3)
+            self.assertIn('Charlie', report.generate_html().decode('utf-8'))
+    
+    def test_integration_releases_connection(self):
+        """Test that generating and previewing through the integration disconnect afterwards."""
+        jrxml = '''<jasperReport name="Names">
+    <queryString><![CDATA[SELECT name FROM test_table]]></queryString>
+    <field name="name" class="java.lang.String"/>
+</jasperReport>'''
+        
+        with mock.patch.object(DatabaseEngine, 'disconnect', autospec=True) as disconnect:
+            data, error = pyjasper_integration.preview_data(jrxml, self.connection_string, limit=2)
+            self.assertEqual((len(data), error), (2, None))
+            self.assertEqual(disconnect.call_count, 1)
+            
+            content, error = pyjasper_integration.generate_report(jrxml, self.connection_string)
+            self.assertIsNone(error)
+            self.assertEqual(disconnect.call_count, 2)
+    
     def test_get_tables(self):
         """Test getting table list."""
         engine = DatabaseEngine(self.connection_string)
@@ -191,6 +282,68 @@ class TestDatabaseEngine(unittest.TestCase):
         self.assertIn('amount', column_names)
 
 
+class TestConnectionPool(unittest.TestCase):
+    """Test pooling of MySQL/PostgreSQL connections between engines."""
+    
+    connection_string = 'postgresql://user@localhost/reports'
+    
+    def setUp(self):
+        """Start each test with an empty pool."""
+        patcher = mock.patch.dict(database._idle_connections, clear=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+    
+    def release(self, connection, opened_at=None):
+        """Disconnect an engine holding connection, as at the end of a report."""
+        engine = DatabaseEngine(self.connection_string)
+        engine.connection = connection
+        engine._opened_at = time.monotonic() if opened_at is None else opened_at
+        engine.disconnect()
+    
+    def test_checkin_and_checkout(self):
+        """Test that a released connection is reused, pinged and left outside a transaction."""
+        connection = mock.MagicMock()
+        self.release(connection)
+        
+        connection.close.assert_not_called()
+        engine = DatabaseEngine(self.connection_string)
+        engine.connect()
+        self.assertIs(engine.connection, connection)
+        connection.cursor.return_value.execute.assert_called_once_with("SELECT 1")
+        # Once when checked in, once after the ping
+        self.assertEqual(connection.rollback.call_count, 2)
+    
+    def test_recycle(self):
+        """Test that connections older than POOL_RECYCLE are closed, not pooled."""
+        connection = mock.MagicMock()
+        self.release(connection, opened_at=time.monotonic() - database.POOL_RECYCLE)
+        
+        connection.close.assert_called_once()
+        self.assertEqual(database._checkout_connection(self.connection_string), (None, None))
+    
+    def test_pool_size(self):
+        """Test that connections beyond POOL_SIZE are closed."""
+        connections = [mock.MagicMock() for _ in range(database.POOL_SIZE + 1)]
+        for connection in connections:
+            self.release(connection)
+        
+        self.assertEqual(len(database._idle_connections[self.connection_string]), database.POOL_SIZE)
+        self.assertEqual([c.close.called for c in connections], [False] * database.POOL_SIZE + [True])
+    
+    def test_dead_connection_dropped(self):
+        """Test that a connection failing the pre-ping is closed and the next one is used."""
+        live, dead = mock.MagicMock(), mock.MagicMock()
+        self.release(live)
+        self.release(dead)
+        dead.cursor.side_effect = Exception('server closed the connection')
+        
+        opened_at, connection = database._checkout_connection(self.connection_string)
+        
+        self.assertIs(connection, live)
+        dead.close.assert_called_once()
+        self.assertEqual(database._idle_connections[self.connection_string], [])
+
+
 class TestDataProcessor(unittest.TestCase):
     """Test data processing functionality."""
     
@@ -228,6 +381,44 @@ class TestDataProcessor(unittest.TestCase):
         
         self.assertEqual(avg_salary, 57500)
     
+    def test_aggregate(self):
+        """Test per-group sum and average."""
+        processor = DataProcessor(self.test_data)
+        stats = processor.aggregate('department', 'salary')
+        
+        self.assertEqual(list(stats), ['Sales', 'IT'])
+        self.assertEqual(stats['Sales']['sum'], 105000)
+        self.assertEqual(stats['IT']['average'], 62500)
+    
+    def test_mixed_value_types(self):
+        """Test that every aggregation path counts Decimal, None and string values alike."""
+        rows = [
+            {'group': 'A', 'amount': Decimal('1.5')},
+            {'group': 'A', 'amount': None},
+            {'group': 'A', 'amount': '2'},
+            {'group': 'B', 'amount': 'n/a'},
+            {'group': 'B', 'amount': True},
+            {'group': 'B'},
+        ]
+        processor = DataProcessor(rows)
+        stats = processor.aggregate('group', 'amount')
+        
+        self.assertEqual(processor.calculate_sum('amount'), 4.5)
+        self.assertEqual(processor.calculate_sum('amount', rows), 4.5)
+        self.assertEqual(stats['A']['sum'], 3.5)
+        self.assertEqual(stats['A']['sum'], processor.calculate_sum('amount', rows[:3]))
+        self.assertEqual(stats['B']['sum'], 1.0)
+        self.assertEqual(processor.calculate_average('amount'), 0.75)
+    
+    def test_empty_data(self):
+        """Test aggregations over no rows."""
+        processor = DataProcessor([])
+        
+        self.assertEqual(processor.calculate_sum('amount'), 0.0)
+        self.assertEqual(processor.calculate_sum('amount', []), 0.0)
+        self.assertEqual(processor.calculate_average('amount'), 0.0)
+        self.assertEqual(processor.aggregate('group', 'amount'), {})
+    
     def test_sort_by(self):
         """Test sorting functionality."""
         processor = DataProcessor(self.test_data)
@@ -282,6 +473,20 @@ class TestJasperReport(unittest.TestCase):
         self.assertIsNotNone(report.report_def)
         self.assertEqual(report.report_def.name, "TestReport")
     
+    def test_jrxml_path_cache(self):
+        """Test that JRXML files are re-read once changed and only the most recent paths are kept."""
+        with tempfile.TemporaryDirectory() as directory, \
+                mock.patch.object(core, '_jrxml_source_cache', LRUCache(2)) as cache:
+            paths = [os.path.join(directory, f'report{i}.jrxml') for i in range(3)]
+            for path in paths:
+                Path(path).write_text(self.sample_jrxml)
+                JasperReport(jrxml_path=path)
+            self.assertEqual(len(cache), 2)
+            
+            Path(paths[2]).write_text(self.sample_jrxml.replace('TestReport', 'Renamed'))
+            os.utime(paths[2], ns=(0, os.stat(paths[2]).st_mtime_ns + 1_000_000_000))
+            self.assertEqual(JasperReport(jrxml_path=paths[2]).report_def.name, 'Renamed')
+    
     def test_set_data(self):
         """Test setting data directly."""
         report = JasperReport(jrxml_content=self.sample_jrxml)
@@ -312,6 +517,55 @@ class TestJasperReport(unittest.TestCase):
         self.assertIsInstance(pdf_content, bytes)
         self.assertTrue(len(pdf_content) > 0)
     
+    def test_stream_html(self):
+        """Test that streamed HTML matches the generated document."""
+        report = JasperReport(jrxml_content=self.sample_jrxml)
+        report.set_data(self.test_data)
+        html_content = report.generate_html()
+        
+        buffer = BytesIO()
+        report.write_html(buffer)
+        
+        self.assertEqual(buffer.getvalue(), html_content)
+        self.assertEqual(b''.join(report.iter_html()), html_content)
+    
+    def test_save_report(self):
+        """Test saving HTML and PDF reports to files."""
+        report = JasperReport(jrxml_content=self.sample_jrxml)
+        report.set_data(self.test_data)
+        
+        with tempfile.TemporaryDirectory() as temp_dir:
+            html_path = os.path.join(temp_dir, 'report.html')
+            pdf_path = os.path.join(temp_dir, 'report.pdf')
+            report.save_report(html_path)
+            report.save_report(pdf_path, 'pdf')
+            
+            self.assertEqual(Path(html_path).read_bytes(), report.generate_html())
+            self.assertTrue(Path(pdf_path).read_bytes().startswith(b'%PDF'))
+            self.assertEqual(sorted(os.listdir(temp_dir)), ['report.html', 'report.pdf'])
+    
+    def test_save_report_failure_leaves_no_file(self):
+        """Test that a failed render leaves neither partial output nor temporary files."""
+        report = JasperReport(jrxml_content=self.sample_jrxml)
+        
+        def failing_write(fileobj):
+            fileobj.write(b'<!DOCTYPE html>')
+            raise RenderError("HTML generation failed: boom")
+        report.write_html = failing_write
+        
+        with tempfile.TemporaryDirectory() as temp_dir:
+            new_path = os.path.join(temp_dir, 'new.html')
+            existing_path = os.path.join(temp_dir, 'existing.html')
+            Path(existing_path).write_bytes(b'previous report')
+            
+            with self.assertRaises(RenderError):
+                report.save_report(new_path)
+            with self.assertRaises(RenderError):
+                report.save_report(existing_path)
+            
+            self.assertEqual(os.listdir(temp_dir), ['existing.html'])
+            self.assertEqual(Path(existing_path).read_bytes(), b'previous report')
+    
     def test_get_report_info(self):
         """Test getting report information."""
         report = JasperReport(jrxml_content=self.sample_jrxml)
@@ -377,6 +631,117 @@ class TestChartRenderer(unittest.TestCase):
         result = renderer.create_chart('bar', self.chart_data, config)
         self.assertIsInstance(result, str)
         self.assertTrue(len(result) > 0)
+    
+    def test_chart_cache(self):
+        """Test that identical charts are rendered once and different ones separately."""
+        renderer = ChartRenderer()
+        with mock.patch.object(renderer, '_render_chart', side_effect=lambda *args: f'chart{len(args[1])}') as render:
+            first = renderer.create_chart('bar', self.chart_data, {'title': 'Sales'})
+            again = renderer.create_chart('bar', [dict(row) for row in self.chart_data], {'title': 'Sales'})
+            renderer.create_chart('bar', self.chart_data, {'title': 'Costs'})
+            renderer.create_chart('bar', self.chart_data[:1], {'title': 'Sales'})
+        
+        self.assertEqual(first, again)
+        self.assertEqual(render.call_count, 3)
+    
+    def test_chart_cache_skips_unpicklable_data(self):
+        """Test that charts whose data cannot be hashed are rendered every time."""
+        renderer = ChartRenderer()
+        data = [{'category': 'A', 'value': 1, 'source': threading.Lock()}]
+        with mock.patch.object(renderer, '_render_chart', return_value='chart') as render:
+            renderer.create_chart('bar', data, {})
+            renderer.create_chart('bar', data, {})
+        
+        self.assertEqual(render.call_count, 2)
+
+
+class TestImageHandler(unittest.TestCase):
+    """Test loading images as data URIs."""
+    
+    def setUp(self):
+        """Create an image file in a temporary directory."""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'logo.png')
+        with open(self.path, 'wb') as f:
+            f.write(b'first')
+    
+    def test_rewritten_file_reencoded(self):
+        """Test that a file rewritten with a new size or mtime is not served from the cache."""
+        self.assertEqual(ImageHandler.load_image(self.path), 'data:image/png;base64,Zmlyc3Q=')
+        
+        with open(self.path, 'wb') as f:
+            f.write(b'second')
+        self.assertEqual(ImageHandler.load_image(self.path), 'data:image/png;base64,c2Vjb25k')
+        
+        # Same size, only the modification time differs
+        with open(self.path, 'wb') as f:
+            f.write(b'thirds')
+        stat = os.stat(self.path)
+        os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        self.assertEqual(ImageHandler.load_image(self.path), 'data:image/png;base64,dGhpcmRz')
+    
+    def test_large_file_not_cached(self):
+        """Test that files over IMAGE_CACHE_MAX_BYTES are encoded without entering the cache."""
+        before = charts._image_data_uri.cache_info().currsize
+        with mock.patch.object(charts, 'IMAGE_CACHE_MAX_BYTES', 4):
+            self.assertEqual(ImageHandler.load_image(self.path), 'data:image/png;base64,Zmlyc3Q=')
+        
+        self.assertEqual(charts._image_data_uri.cache_info().currsize, before)
+
+
+class TestLRUCache(unittest.TestCase):
+    """Test the bounded cache shared by the report engines."""
+    
+    def test_evicts_least_recently_used(self):
+        """Test that reads refresh an entry and the stalest one is dropped past maxsize."""
+        cache = LRUCache(2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+        cache.put('c', 3)
+        
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.get('c'), 3)
+        self.assertEqual(cache.get('b', 'missing'), 'missing')
+        self.assertEqual(len(cache), 2)
+    
+    def test_put_replaces_and_refreshes(self):
+        """Test that storing an existing key updates it and makes it most recent."""
+        cache = LRUCache(2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        cache.put('a', 10)
+        cache.put('c', 3)
+        
+        self.assertEqual(cache.get('a'), 10)
+        self.assertIsNone(cache.get('b'))
+    
+    def test_concurrent_use(self):
+        """Test that threads sharing one cache never push it past maxsize or lose entries."""
+        cache = LRUCache(8)
+        errors = []
+        
+        def worker(offset):
+            try:
+                for i in range(2000):
+                    key = (offset + i) % 16
+                    cache.put(key, key)
+                    value = cache.get(key)
+                    if value is not None and value != key:
+                        errors.append((key, value))
+            except Exception as e:
+                errors.append(e)
+        
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        self.assertEqual(errors, [])
+        self.assertEqual(len(cache), 8)
 
 
 class TestFormattingUtils(unittest.TestCase):
@@ -405,6 +770,66 @@ class TestFormattingUtils(unittest.TestCase):
         
         result = FormattingUtils.format_number(1000, 0, "")
         self.assertEqual(result, "1000")
+    
+    def test_conditional_formatting_operators(self):
+        """Test each conditional formatting operator."""
+        red = {'color': 'red'}
+        cases = [
+            ('equals', 'Paid', 'Paid', 'paid'),
+            ('greater_than', '100', 100.5, 100),
+            ('less_than', 0, -1, 0),
+            ('greater_equal', 10, '10', 9.99),
+            ('less_equal', '2.5', 2.5, 2.51),
+            ('contains', 'ERR', 'disk error', 'ok'),
+            ('starts_with', 'inv-', 'INV-001', 'PO-001'),
+            ('ends_with', '.PDF', 'report.pdf', 'report.html'),
+        ]
+        for condition_type, condition_value, matching, other in cases:
+            with self.subTest(condition_type=condition_type):
+                conditions = [{'type': condition_type, 'value': condition_value, 'styles': red}]
+                self.assertEqual(FormattingUtils.apply_conditional_formatting(matching, conditions), red)
+                self.assertEqual(FormattingUtils.apply_conditional_formatting(other, conditions), {})
+    
+    def test_conditional_formatting_missing_fields(self):
+        """Test conditions that leave out their type, value or styles."""
+        self.assertEqual(FormattingUtils.apply_conditional_formatting(
+            'x', [{'value': 'x', 'styles': {'color': 'red'}}]), {'color': 'red'})
+        self.assertEqual(FormattingUtils.apply_conditional_formatting(
+            None, [{'type': 'equals', 'styles': {'color': 'red'}}]), {'color': 'red'})
+        self.assertEqual(FormattingUtils.apply_conditional_formatting(
+            5, [{'type': 'greater_than', 'value': 1}]), {})
+        self.assertEqual(FormattingUtils.apply_conditional_formatting(
+            5, [{'type': 'greater_than', 'styles': {'color': 'red'}}]), {})
+        self.assertEqual(FormattingUtils.apply_conditional_formatting(
+            5, [{'type': 'between', 'value': 1, 'styles': {'color': 'red'}}]), {})
+        self.assertEqual(FormattingUtils.apply_conditional_formatting(5, []), {})
+    
+    def test_conditional_formatting_non_numeric(self):
+        """Test that numeric conditions never match values or thresholds that are not numbers."""
+        conditions = [{'type': 'less_than', 'value': 10, 'styles': {'color': 'red'}}]
+        for value in ('n/a', None, '', [1]):
+            with self.subTest(value=value):
+                self.assertEqual(FormattingUtils.apply_conditional_formatting(value, conditions), {})
+        
+        conditions = [{'type': 'less_than', 'value': 'ten', 'styles': {'color': 'red'}}]
+        self.assertEqual(FormattingUtils.apply_conditional_formatting(5, conditions), {})
+    
+    def test_conditional_formatting_order(self):
+        """Test that rules are tried in order and the first match supplies all of its styles."""
+        format_value = FormattingUtils.compile_conditions([
+            {'type': 'less_than', 'value': 0, 'styles': {'color': 'red', 'font-weight': 'bold'}},
+            {'type': 'less_than', 'value': 100, 'styles': {'color': 'orange'}},
+            {'type': 'greater_equal', 'value': 0, 'styles': {'color': 'green'}},
+        ])
+        
+        self.assertEqual(format_value(-5), {'color': 'red', 'font-weight': 'bold'})
+        self.assertEqual(format_value(50), {'color': 'orange'})
+        self.assertEqual(format_value(500), {'color': 'green'})
+        self.assertEqual(format_value('n/a'), {})
+        
+        # Each call returns its own dict, so callers may modify it
+        format_value(-5)['color'] = 'blue'
+        self.assertEqual(format_value(-5)['color'], 'red')
 
 
 class TestSubreportManager(unittest.TestCase):
@@ -491,10 +916,12 @@ if __name__ == '__main__':
     test_classes = [
         TestJRXMLParser,
         TestDatabaseEngine,
+        TestConnectionPool,
         TestDataProcessor,
         TestJasperReport,
         TestReportBuilder,
         TestChartRenderer,
+        TestImageHandler,
         TestFormattingUtils,
         TestSubreportManager,
         TestTemplateManager
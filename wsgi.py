@@ -0,0 +1,16 @@
+"""
+WSGI entry point for production servers.
+
+Run with Gunicorn using the bundled config:
+
+    gunicorn -c gunicorn.conf.py wsgi:application
+"""
+
+from app import create_app
+
+application = create_app()
+
+if application.debug:
+    # Keep the interactive debugger available when running under Gunicorn in development
+    from werkzeug.debug import DebuggedApplication
+    application.wsgi_app = DebuggedApplication(application.wsgi_app, evalex=True)